@@ -1,22 +1,42 @@
 import os
-import json
-import time
+import hashlib
+from contextlib import closing
+import threading
+import orjson
+from datetime import datetime
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask import Response, stream_with_context
+from flask.json.provider import JSONProvider
 from dotenv import load_dotenv
+from sqlalchemy import func, select
+from cachetools import TTLCache
 
-from db import init_db, SessionLocal
-from models import ChatSession, Message, UserProfile
-from llm import generate_reply
+from db import init_db, SessionLocal, load_history, bulk_create_messages
+from models import ChatSession, Message, UserProfile, gen_uuid
+from llm import generate_reply, generate_reply_stream
+from prompt import HISTORY_TURNS
 from recipes import search_recipes_tavily
+from chat_streams import chat_runs
 
 # If you later enable LangGraph, import run_graph and switch via use_graph flag
-from llm_graph import run_graph
+from llm_graph import run_graph, run_graph_stream
 
 load_dotenv()
 
+
+class OrjsonProvider(JSONProvider):
+    """jsonify / request.get_json backed by orjson (native datetime, UUID and dataclass support)."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app, resources={r"/*": {"origins": os.getenv("FRONTEND_ORIGIN", "http://localhost:5173").split(",") + ["https://myrecipefinder-frontend-production.up.railway.app"]}})
 
 # Initialize DB tables on startup
@@ -45,6 +65,36 @@ def _startup_checks():
 
 _startup_checks()
 
+SYSTEM_INSTRUCTIONS = (
+    "You are a helpful nutrition-aware cooking assistant. Prefer healthier substitutions, "
+    "and structure recipes as ingredients then numbered steps. If a user health profile or "
+    "selected recipe context is provided, use it."
+)
+
+
+def _save_message(session_id: str, role: str, content: str) -> None:
+    db = SessionLocal()
+    try:
+        bulk_create_messages(db, [{"session_id": session_id, "role": role, "content": content}])
+        db.commit()
+    finally:
+        db.close()
+
+
+def _etag(fingerprint: str) -> str:
+    return hashlib.md5(fingerprint.encode()).hexdigest()
+
+
+def _with_etag(resp: Response, etag: str) -> Response:
+    resp.set_etag(etag)
+    # Let browsers keep the body but revalidate every time (cheap 304 when unchanged)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+def _not_modified(etag: str) -> Response:
+    return _with_etag(Response(status=304), etag)
+
 
 @app.get("/health")
 def health():
@@ -71,16 +121,26 @@ def get_history():
         return jsonify({"error": "session_id is required"}), 400
     db = SessionLocal()
     try:
+        # Cheap fingerprint first; the full SELECT + JSON build only runs on a miss
+        last_ts, count = (
+            db.query(func.max(Message.created_at), func.count(Message.id))
+            .filter(Message.session_id == session_id)
+            .one()
+        )
+        etag = _etag(f"{last_ts}:{count}")
+        if request.if_none_match.contains(etag):
+            return _not_modified(etag)
+
         msgs = (
             db.query(Message)
             .filter(Message.session_id == session_id)
             .order_by(Message.created_at.asc())
             .all()
         )
-        return jsonify([
+        return _with_etag(jsonify([
             {"role": m.role, "content": m.content, "created_at": m.created_at.isoformat()}
             for m in msgs
-        ])
+        ]), etag)
     finally:
         db.close()
 
@@ -98,6 +158,28 @@ def chat():
     if not user_msg:
         return jsonify({"error": "message is required"}), 400
 
+    # A client falling back from a broken stream sends the stream's request_id: if that
+    # reply is still generated (or was just finished) here, return it rather than
+    # generating and saving the same turn a second time
+    request_id = data.get("request_id")
+    run = chat_runs.get(f"{session_id}:{request_id}") if request_id else None
+    if run is not None:
+        app.logger.info("chat request joins stream %s", run.key)
+        reply = "".join(event[1] for event in run.subscribe() if event is not None)
+        return jsonify({"reply": reply.strip()})
+
+    # Guardrails: required keys
+    if not (os.getenv("COHERE_API_KEY") or os.getenv("CO_API_KEY")):
+        return jsonify({
+            "error": "Missing Cohere API key. Set COHERE_API_KEY (preferred) or CO_API_KEY in backend/.env."
+        }), 400
+    if use_graph and not os.getenv("TAVILY_API_KEY"):
+        return jsonify({
+            "error": "Missing TAVILY_API_KEY. Set it in backend/.env or set use_graph=false to skip web search."
+        }), 400
+
+    # Short session: persist the user message and read history, then release
+    # the connection so it isn't held across the (seconds-long) LLM call
     db = SessionLocal()
     try:
         sess = db.query(ChatSession).get(session_id)
@@ -105,62 +187,54 @@ def chat():
             return jsonify({"error": "invalid session_id"}), 404
 
         # persist user message
-        db.add(Message(session_id=session_id, role="user", content=user_msg))
+        bulk_create_messages(db, [{"session_id": session_id, "role": "user", "content": user_msg}])
         db.commit()
 
         # Load history for context
-        history = (
-            db.query(Message)
-            .filter(Message.session_id == session_id)
-            .order_by(Message.created_at.asc())
-            .all()
-        )
-        history_messages = [{"role": m.role, "content": m.content} for m in history]
+        history_messages = load_history(db, session_id, limit=HISTORY_TURNS + 1)
+    finally:
+        db.close()
 
-        system_instructions = (
-            "You are a helpful nutrition-aware cooking assistant. Prefer healthier substitutions, "
-            "and structure recipes as ingredients then numbered steps. If a user health profile or "
-            "selected recipe context is provided, use it."
-        )
+    # Use LangGraph orchestration when requested; fall back to direct LLM on errors
+    if use_graph:
+        try:
+            reply = run_graph(session_id=session_id, user_message=user_msg, selected_context=context)
+        except Exception as e:
+            app.logger.exception("LangGraph pipeline failed, falling back to direct LLM: %s", e)
+            reply = generate_reply(SYSTEM_INSTRUCTIONS, history_messages, user_msg, context)
+    else:
+        reply = generate_reply(SYSTEM_INSTRUCTIONS, history_messages, user_msg, context)
 
-        # Guardrails: required keys
-        if not (os.getenv("COHERE_API_KEY") or os.getenv("CO_API_KEY")):
-            return jsonify({
-                "error": "Missing Cohere API key. Set COHERE_API_KEY (preferred) or CO_API_KEY in backend/.env."
-            }), 400
-        if use_graph and not os.getenv("TAVILY_API_KEY"):
-            return jsonify({
-                "error": "Missing TAVILY_API_KEY. Set it in backend/.env or set use_graph=false to skip web search."
-            }), 400
-
-        # Use LangGraph orchestration when requested; fall back to direct LLM on errors
-        if use_graph:
-            try:
-                reply = run_graph(session_id=session_id, user_message=user_msg, selected_context=context)
-            except Exception as e:
-                app.logger.exception("LangGraph pipeline failed, falling back to direct LLM: %s", e)
-                reply = generate_reply(system_instructions, history_messages, user_msg, context)
-        else:
-            reply = generate_reply(system_instructions, history_messages, user_msg, context)
+    # Ensure we have a complete response
+    if not reply or len(reply.strip()) < 10:
+        reply = "I'm sorry, I couldn't generate a complete response. Please try again with a more specific question."
+        app.logger.warning(f"Generated short/invalid response: '{reply}'")
 
-        # Ensure we have a complete response
-        if not reply or len(reply.strip()) < 10:
-            reply = "I'm sorry, I couldn't generate a complete response. Please try again with a more specific question."
-            app.logger.warning(f"Generated short/invalid response: '{reply}'")
+    # persist assistant reply in a second short session
+    _save_message(session_id, "assistant", reply)
 
-        # persist assistant reply (LangGraph would persist inside the graph instead)
-        db.add(Message(session_id=session_id, role="assistant", content=reply))
-        db.commit()
+    return jsonify({"reply": reply})
 
-        return jsonify({"reply": reply})
-    finally:
-        db.close()
+
+def _sse_data(text: str) -> str:
+    """Frame text as one SSE event; multi-line text becomes several data: lines,
+    which EventSource joins back together with newlines."""
+    return "".join(f"data: {line}\n" for line in text.split("\n")) + "\n"
+
+
+def _last_event_id() -> int:
+    try:
+        return int(request.headers.get("Last-Event-ID", ""))
+    except ValueError:
+        return -1
 
 
 @app.get("/api/chat/stream")
 def chat_stream():
     """Server-Sent Events streaming for chat responses.
-    Consumes query params: session_id, message, use_graph (optional), context (optional JSON string)
+    Consumes query params: session_id, message, use_graph (optional), context (optional JSON string),
+    request_id (optional, unique per sent message; lets reconnects resume the same reply).
+    Events carry their chunk index as id; a Last-Event-ID header resumes after it.
     """
     session_id = request.args.get("session_id")
     user_msg = request.args.get("message", "").strip()
@@ -169,8 +243,10 @@ def chat_stream():
     context = {}
     if ctx_raw:
         try:
-            context = json.loads(ctx_raw)
-        except Exception:
+            context = orjson.loads(ctx_raw)
+        except orjson.JSONDecodeError:
+            context = {}
+        if not isinstance(context, dict):
             context = {}
 
     if not session_id or not user_msg:
@@ -186,63 +262,80 @@ def chat_stream():
             "error": "Missing TAVILY_API_KEY. Set it in backend/.env or set use_graph=false to skip web search."
         }), 400
 
-    def generate_stream():
+    def produce(run):
+        # Runs once per (session, message) in a background worker: it owns the whole
+        # turn, so a client that disconnects or reconnects never triggers another LLM call.
+        # Short session for the user message + history; none held while streaming.
         db = SessionLocal()
         try:
-            # persist user message
-            db.add(Message(session_id=session_id, role="user", content=user_msg))
-            db.commit()
-
-            # load brief history
-            history = (
-                db.query(Message)
-                .filter(Message.session_id == session_id)
-                .order_by(Message.created_at.asc())
-                .all()
-            )
-            history_messages = [{"role": m.role, "content": m.content} for m in history]
-
-            system_instructions = (
-                "You are a helpful nutrition-aware cooking assistant. Prefer healthier substitutions, "
-                "and structure recipes as ingredients then numbered steps. If a user health profile or "
-                "selected recipe context is provided, use it."
-            )
-
-            # get full reply (reusing existing logic for correctness), then chunk it
-            try:
-                if use_graph:
-                    from llm_graph import run_graph
-                    reply = run_graph(session_id=session_id, user_message=user_msg, selected_context=context)
-                else:
-                    reply = generate_reply(system_instructions, history_messages, user_msg, context)
-
-                # Ensure we have a complete response
-                if not reply or len(reply.strip()) < 10:
-                    reply = "I'm sorry, I couldn't generate a complete response. Please try again."
-
-            except Exception as e:
-                app.logger.exception("LLM generation failed: %s", e)
-                reply = f"I'm sorry, I encountered an error: {str(e)}. Please try again."
-                yield f"data: {reply}\n\n"
-                yield "event: end\ndata: done\n\n"
-                return
-
-            # persist assistant reply
-            db.add(Message(session_id=session_id, role="assistant", content=reply))
+            bulk_create_messages(db, [{"session_id": session_id, "role": "user", "content": user_msg}])
             db.commit()
-
-            # Stream in smaller chunks to prevent truncation
-            chunk_size = 150  # Balanced chunk size for streaming
-            for i in range(0, len(reply), chunk_size):
-                chunk = reply[i:i+chunk_size]
-                yield f"data: {chunk}\n\n"
-                time.sleep(0.01)  # Small delay to prevent overwhelming the client
-
-            # signal end
-            yield "event: end\ndata: done\n\n"
+            history_messages = load_history(db, session_id, limit=HISTORY_TURNS + 1)
         finally:
             db.close()
 
+        # publish chunks as the model produces them; keep the concatenated
+        # reply only for the DB persist once the stream closes
+        parts = []
+        try:
+            if use_graph:
+                chunks = run_graph_stream(session_id=session_id, user_message=user_msg, selected_context=context)
+            else:
+                chunks = generate_reply_stream(SYSTEM_INSTRUCTIONS, history_messages, user_msg, context)
+            for chunk in chunks:
+                if run.cancelled:
+                    # Stop pressed or every client gone past the grace period: stop the
+                    # model stream and keep whatever was already shown
+                    chunks.close()
+                    break
+                parts.append(chunk)
+                run.publish(chunk)
+        except Exception as e:
+            app.logger.exception("LLM generation failed: %s", e)
+            run.publish(f"I'm sorry, I encountered an error: {str(e)}. Please try again.")
+            run.retain = False
+            return
+
+        reply = "".join(parts).strip()
+        if run.cancelled:
+            app.logger.info("chat stream %s cancelled after %d chunks", run.key, len(parts))
+            if len(reply) >= 10:
+                _save_message(session_id, "assistant", reply)
+            return
+        # Ensure we have a complete response to show and persist
+        if len(reply) < 10:
+            app.logger.warning("Generated short/invalid streamed response: '%s'", reply)
+            reply = "I'm sorry, I couldn't generate a complete response. Please try again."
+            run.publish(("\n\n" if parts else "") + reply)
+
+        # persist assistant reply once, when generation finishes
+        _save_message(session_id, "assistant", reply)
+
+    # Only an EventSource reconnect (same URL, so same request_id) attaches to an existing
+    # run; a new message, even with the same text, always gets its own generation
+    request_id = request.args.get("request_id") or gen_uuid()
+    run_key = f"{session_id}:{request_id}"
+    run, started = chat_runs.get_or_start(run_key, produce)
+    if not started:
+        app.logger.info("attaching to in-flight chat stream %s", run_key)
+
+    # Each chunk is sent with its index as the event id; a browser reconnect sends the
+    # last one back so the client, which appends chunks, doesn't receive them twice
+    start = _last_event_id() + 1
+
+    def generate_stream():
+        # closing() ends the subscription as soon as the client disconnects, which lets
+        # the run notice it has no listeners left
+        with closing(run.subscribe(start)) as events:
+            for event in events:
+                # None is a heartbeat while waiting on the model; SSE comments keep proxies from timing out
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"id: {event[0]}\n" + _sse_data(event[1])
+        # signal end
+        yield "event: end\ndata: done\n\n"
+
     headers = {
         "Content-Type": "text/event-stream",
         "Cache-Control": "no-cache",
@@ -252,6 +345,17 @@ def chat_stream():
     return Response(stream_with_context(generate_stream()), headers=headers)
 
 
+@app.post("/api/chat/stream/cancel")
+def chat_stream_cancel():
+    """Stop button: end generation of a streamed reply (the partial reply is kept)."""
+    data = request.get_json(silent=True) or {}
+    session_id = data.get("session_id")
+    request_id = data.get("request_id")
+    if not session_id or not request_id:
+        return jsonify({"error": "session_id and request_id are required"}), 400
+    return jsonify({"cancelled": chat_runs.cancel(f"{session_id}:{request_id}")})
+
+
 @app.get("/api/recipes/search")
 def recipes_search():
     q = request.args.get("q", "")
@@ -269,24 +373,59 @@ def recipes_search():
     return jsonify(results)
 
 
-@app.get("/api/profile")
-def get_profile():
+# Single-row profile, changed rarely. Each read checks the row's (id, updated_at), which any
+# worker's save changes, and reuses the fields loaded for that version
+_profile_cache = TTLCache(maxsize=1, ttl=int(os.getenv("PROFILE_CACHE_TTL", "60")))
+_profile_lock = threading.Lock()
+_PROFILE_VERSION = select(UserProfile.id, UserProfile.updated_at).limit(1)
+
+
+def _load_profile() -> tuple[str, dict]:
+    """Return (etag, profile fields) for the stored profile."""
     db = SessionLocal()
     try:
-        p = db.query(UserProfile).first()
-        if not p:
-            return jsonify({"diet": "", "allergens": "", "goals": ""})
-        return jsonify({"diet": p.diet, "allergens": p.allergens, "goals": p.goals})
+        row = db.execute(_PROFILE_VERSION).first()
+        if not row:
+            return _etag("empty"), {"diet": "", "allergens": "", "goals": ""}
+        version = (row.id, row.updated_at)
+        with _profile_lock:
+            hit = _profile_cache.get(version)
+        if hit is None:
+            p = db.get(UserProfile, row.id)
+            hit = _etag(f"{p.id}:{p.updated_at}"), {"diet": p.diet, "allergens": p.allergens, "goals": p.goals}
+            with _profile_lock:
+                _profile_cache[version] = hit
+        return hit
     finally:
         db.close()
 
 
+@app.get("/api/profile")
+def get_profile():
+    etag, profile = _load_profile()
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+    return _with_etag(jsonify(profile), etag)
+
+
+def _normalize_csv(value: str) -> str:
+    """Canonical comma-separated list: items trimmed, blanks and case-insensitive repeats dropped"""
+    seen, items = set(), []
+    for item in (value or "").split(","):
+        item = " ".join(item.split())
+        if item and item.lower() not in seen:
+            seen.add(item.lower())
+            items.append(item)
+    return ", ".join(items)
+
+
 @app.post("/api/profile")
 def save_profile():
     data = request.get_json(silent=True) or {}
     diet = data.get("diet", "")
-    allergens = data.get("allergens", "")
-    goals = data.get("goals", "")
+    # stored canonical so the same profile always yields the same prompt and search text
+    allergens = _normalize_csv(data.get("allergens", ""))
+    goals = _normalize_csv(data.get("goals", ""))
     db = SessionLocal()
     try:
         p = db.query(UserProfile).first()
@@ -297,6 +436,7 @@ def save_profile():
             p.diet = diet
             p.allergens = allergens
             p.goals = goals
+            p.updated_at = datetime.utcnow()
         db.commit()
         return jsonify({"ok": True})
     finally:
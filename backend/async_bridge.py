@@ -0,0 +1,66 @@
+"""
+Shared asyncio event loop for the (sync, threaded) Flask app.
+Flask's `async def` views spin up a fresh event loop per request, so nothing
+async outlives a request and concurrent requests never share a loop. Views
+instead hand their coroutines to run_async, which schedules them on one
+long-lived loop in a daemon thread: awaits from different requests interleave
+there, and loop-bound objects (sessions, semaphores, locks) can be reused.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, AsyncIterator, Awaitable, Iterator, Optional
+
+logger = logging.getLogger("async_bridge")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def _new_loop() -> asyncio.AbstractEventLoop:
+    try:
+        import uvloop  # optional; faster loop when installed
+        return uvloop.new_event_loop()
+    except ImportError:
+        return asyncio.new_event_loop()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared loop, starting its thread on first use (after any fork)."""
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = _new_loop()
+                threading.Thread(target=loop.run_forever, name="async-bridge", daemon=True).start()
+                logger.info("shared event loop started (%s)", type(loop).__name__)
+                _loop = loop
+    return _loop
+
+
+def run_async(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the shared loop and block the calling thread for its result."""
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        return future.result(timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise
+
+
+def iter_async(agen: AsyncIterator[Any]) -> Iterator[Any]:
+    """Drive an async iterator on the shared loop from sync code (e.g. a streaming
+    Flask response), one item at a time. Closing this generator early, as WSGI does
+    when the client disconnects, also closes the async one."""
+    try:
+        while True:
+            try:
+                yield run_async(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        aclose = getattr(agen, "aclose", None)
+        if aclose is not None:
+            run_async(aclose())
@@ -0,0 +1,85 @@
+"""
+Micro-batching for async lookups.
+Calls arriving within a short window are queued and handed to one
+process_batch(items) call; each caller's future resolves to its own slot of
+the returned list. The batch function decides how to serve the batch (a bulk
+upstream request, or deduping identical items and fanning out).
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Generic, List, Set, Tuple, TypeVar
+
+logger = logging.getLogger("batching")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class AsyncBatcher(Generic[T, R]):
+    """Coalesce process(item) calls into process_batch(items) calls.
+
+    A batch is flushed when it reaches max_batch_size or max_queue_time seconds
+    after its first item. process_batch must return one result per item, in
+    order; an exception instance in a slot is raised to that caller only.
+    Pending batches are kept per event loop, so the batcher can be shared by
+    callers on different loops.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[T]], Awaitable[List[Any]]],
+        max_batch_size: int = 32,
+        max_queue_time: float = 0.02,
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_queue_time = max_queue_time
+        self._lock = threading.Lock()
+        self._pending: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, List[Tuple[T, asyncio.Future]]]" = weakref.WeakKeyDictionary()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def process(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            batch = self._pending.get(loop)
+            if batch is None:
+                batch = self._pending[loop] = []
+                loop.call_later(self.max_queue_time, self._flush, loop, batch)
+            batch.append((item, fut))
+            full = len(batch) >= self.max_batch_size
+        if full:
+            self._flush(loop, batch)
+        return await fut
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        with self._lock:
+            # Already flushed (size limit reached before the timer fired)
+            if self._pending.get(loop) is not batch:
+                return
+            del self._pending[loop]
+        task = loop.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        try:
+            results = await self.process_batch([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"process_batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logger.warning("batch of %d failed: %s", len(batch), e)
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), result in zip(batch, results):
+            if fut.done():
+                continue
+            if isinstance(result, BaseException):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
@@ -0,0 +1,148 @@
+"""
+In-process fan-out for streamed chat replies.
+Each reply is produced once by a background worker that publishes chunks to a
+ChatRun; SSE requests subscribe from a chunk index (the client's Last-Event-ID),
+so a reconnect resumes the running generation instead of starting another LLM
+call. A run nobody is subscribed to for `grace` seconds, or one cancelled
+explicitly, reports `cancelled` and its producer stops generating.
+
+Runs live in process memory: with several gunicorn workers a reconnect only
+dedupes when it lands on the same worker.
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("chat_streams")
+
+
+class ChatRun:
+    """Chunks of one reply, appended by the producer and read by any number of subscribers."""
+
+    def __init__(self, key: str, grace: float = 5.0):
+        self.key = key
+        self.grace = grace
+        self.chunks: List[str] = []
+        self.done = False
+        self.finished_at: Optional[float] = None
+        # Failed runs are dropped on finish so a retry starts a fresh generation
+        self.retain = True
+        self.subscribers = 0
+        # Counts as idle from creation until the first subscriber arrives
+        self._idle_since: Optional[float] = time.monotonic()
+        self._cancelled = False
+        self._cond = threading.Condition()
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancel() was called or no subscriber has been attached for `grace` seconds."""
+        with self._cond:
+            if self._cancelled:
+                return True
+            return self._idle_since is not None and time.monotonic() - self._idle_since > self.grace
+
+    def cancel(self) -> None:
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+
+    def publish(self, chunk: str) -> None:
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self) -> None:
+        with self._cond:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._cond.notify_all()
+
+    def subscribe(self, start: int = 0, heartbeat: float = 15.0) -> Iterator[Optional[Tuple[int, str]]]:
+        """Yield (index, chunk) from `start`, then follow new chunks until the run finishes.
+        Yields None after `heartbeat` seconds without output so callers can keep the connection alive."""
+        i = max(start, 0)
+        with self._cond:
+            self.subscribers += 1
+            self._idle_since = None
+        try:
+            while True:
+                with self._cond:
+                    if i >= len(self.chunks) and not self.done:
+                        self._cond.wait(timeout=heartbeat)
+                    new = self.chunks[i:]
+                    done = self.done
+                if new:
+                    for chunk in new:
+                        yield i, chunk
+                        i += 1
+                elif done:
+                    return
+                else:
+                    yield None
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+                if not self.subscribers:
+                    self._idle_since = time.monotonic()
+
+class ChatRunRegistry:
+    """Starts at most one producer per key and keeps finished runs briefly for late reconnects."""
+
+    def __init__(self, max_workers: int = 16, retention: float = 60.0, grace: float = 5.0):
+        self.retention = retention
+        self.grace = grace
+        self._runs: Dict[str, ChatRun] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chat-run")
+
+    def get_or_start(self, key: str, producer: Callable[[ChatRun], None]) -> Tuple[ChatRun, bool]:
+        with self._lock:
+            self._prune()
+            run = self._runs.get(key)
+            if run is not None:
+                return run, False
+            run = ChatRun(key, grace=self.grace)
+            self._runs[key] = run
+        self._pool.submit(self._produce, run, producer)
+        return run, True
+
+    def get(self, key: str) -> Optional[ChatRun]:
+        with self._lock:
+            return self._runs.get(key)
+
+    def cancel(self, key: str) -> bool:
+        """Ask the producer of a running reply to stop; False if there is no such run."""
+        run = self.get(key)
+        if run is None or run.done:
+            return False
+        run.cancel()
+        return True
+
+    def _produce(self, run: ChatRun, producer: Callable[[ChatRun], None]) -> None:
+        try:
+            producer(run)
+        except Exception:
+            logger.exception("chat run %s failed", run.key)
+            run.retain = False
+        finally:
+            run.finish()
+            if not run.retain:
+                with self._lock:
+                    if self._runs.get(run.key) is run:
+                        del self._runs[run.key]
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        stale = [k for k, r in self._runs.items() if r.done and now - (r.finished_at or now) > self.retention]
+        for k in stale:
+            del self._runs[k]
+
+
+chat_runs = ChatRunRegistry(
+    max_workers=int(os.getenv("CHAT_STREAM_WORKERS", "32")),
+    grace=float(os.getenv("CHAT_STREAM_GRACE", "5")),
+)
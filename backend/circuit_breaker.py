@@ -0,0 +1,84 @@
+"""
+Circuit breaker for flaky upstream APIs.
+CLOSED lets calls through and counts consecutive failures; after
+failure_threshold of them it trips OPEN and rejects calls for break_duration
+seconds. Then it goes HALF_OPEN and admits a single probe: success closes the
+circuit, failure re-opens it and restarts the timer.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict
+
+logger = logging.getLogger("circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Per-API breaker. Callers check allow_request() before a call and report the
+    outcome with record_success() / record_failure(). State is guarded by a
+    threading lock so one breaker can be shared by callers on different loops."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        break_duration: float = 60.0,
+        minimum_throughput: int = 2,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.break_duration = break_duration
+        self.minimum_throughput = minimum_throughput
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_success = 0.0
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if now - self.opened_at < self.break_duration:
+                    return False
+                self.state = HALF_OPEN
+                logger.info("%s circuit half-open, probing", self.name)
+            # HALF_OPEN: one probe at a time; a probe that never reported back
+            # (e.g. its caller was cancelled) is given up after break_duration
+            if self._probe_started and now - self._probe_started < self.break_duration:
+                return False
+            self._probe_started = now
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("%s circuit closed", self.name)
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_started = 0.0
+            self.last_success = time.time()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probe_started = 0.0
+            # Failures are consecutive (any success resets them), so the failure count
+            # doubles as the number of calls observed since the circuit last closed
+            if self.state == HALF_OPEN or self.failures >= max(self.failure_threshold, self.minimum_throughput):
+                if self.state != OPEN:
+                    logger.warning("%s circuit open after %d failures", self.name, self.failures)
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "last_success": self.last_success}
@@ -1,13 +1,93 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, insert, text
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import StaticPool
 
 DB_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
-connect_args = {"check_same_thread": False} if DB_URL.startswith("sqlite") else {}
-engine = create_engine(DB_URL, connect_args=connect_args, pool_pre_ping=True)
+IS_SQLITE = DB_URL.startswith("sqlite")
+connect_args = {"check_same_thread": False} if IS_SQLITE else {}
+if ":memory:" in DB_URL:
+    # One shared connection, otherwise each thread would see its own empty database
+    pool_args = {"poolclass": StaticPool}
+else:
+    pool_args = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "40")),
+    }
+    if not IS_SQLITE:
+        # Server connections can be dropped by the DB or a proxy while idle; a local
+        # SQLite file can't, so it skips the SELECT 1 on every checkout
+        pool_args.update(pool_pre_ping=True, pool_recycle=1800)
+engine = create_engine(DB_URL, connect_args=connect_args, **pool_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+if IS_SQLITE:
+    # WAL lets readers proceed during writes and, with synchronous=NORMAL, avoids an
+    # fsync per commit; the rest keeps temp tables and hot pages in memory.
+    _SQLITE_PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA cache_size=-65536",
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for pragma in _SQLITE_PRAGMAS:
+            cur.execute(pragma)
+        cur.close()
+
+def insert_ignore(model):
+    """INSERT for `model` that skips rows violating a unique constraint
+    (call .on_conflict_do_nothing(...) on the result); SQLite and PostgreSQL"""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
 def init_db():
     from models import ChatSession, Message, RecipeCache, UserProfile  # noqa: F401
     Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so add indexes introduced later
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    # superseded by ix_recipe_cache_query_created
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_recipe_cache_query")
+
+
+# Hot path for every chat turn: read plain (role, content) tuples instead of
+# materializing Message objects that are discarded right after
+_HISTORY_SQL = text(
+    "SELECT role, content FROM messages WHERE session_id = :session_id ORDER BY created_at ASC"
+)
+# Newest-first with a LIMIT so long sessions never pull more rows than the prompt uses
+_RECENT_HISTORY_SQL = text(
+    "SELECT role, content FROM messages WHERE session_id = :session_id "
+    "ORDER BY created_at DESC LIMIT :limit"
+)
+
+def load_history(db, session_id: str, limit: int | None = None) -> list[dict]:
+    """Return the session's messages oldest-first; with `limit`, only the most recent ones."""
+    if limit is None:
+        rows = db.execute(_HISTORY_SQL, {"session_id": session_id}).all()
+    else:
+        rows = db.execute(_RECENT_HISTORY_SQL, {"session_id": session_id, "limit": limit}).all()
+        rows.reverse()
+    return [{"role": role, "content": content} for role, content in rows]
+
+
+def bulk_create_messages(db, rows: list[dict]) -> list[str]:
+    """Insert messages (dicts of session_id/role/content) in one Core INSERT, skipping
+    the ORM unit of work; ids are generated up front so nothing needs reading back.
+    The caller commits. Returns the new ids in order."""
+    from models import Message, gen_uuid
+    values = [{"id": gen_uuid(), **row} for row in rows]
+    if values:
+        db.execute(insert(Message), values)
+    return [v["id"] for v in values]
@@ -6,17 +6,12 @@ Combines existing functionality with external API data
 import os
 import json
 import logging
-from typing import List, Dict, Any, Optional
-from tavily import TavilyClient
+from typing import AsyncIterator, List, Dict, Any, Optional
 from mcp_client import mcp_client
+from recipes import get_tavily_api_key, tavily_search
 
 logger = logging.getLogger("enhanced-recipes")
 
-# Initialize Tavily client if API key is available
-tc = None
-tavily_api_key = os.getenv("TAVILY_API_KEY")
-if tavily_api_key:
-    tc = TavilyClient(api_key=tavily_api_key)
 
 async def search_recipes_enhanced(
     query: str,
@@ -44,45 +39,75 @@ async def search_recipes_enhanced(
                 max_results=max_results
             )
 
-            for recipe in mcp_recipes:
-                # Enhance with MCP analysis
-                enhanced_recipe = await mcp_client.enhance_recipe_with_mcp(recipe)
-                recipes.append(enhanced_recipe)
+            # Enhance with MCP analysis (all recipes analyzed concurrently)
+            recipes.extend(await mcp_client.enhance_recipes_with_mcp(mcp_recipes))
 
         # Fallback to Tavily if MCP doesn't return enough results
-        if len(recipes) < max_results and tc:
-            try:
-                # Combine query with dietary context
-                search_query = f"{query} {dietary_context}".strip()
-                response = tc.search(
-                    query=search_query,
-                    search_depth="advanced",
-                    include_images=False,
-                    max_results=max_results - len(recipes)
-                )
-
-                # Process Tavily results
-                for result in response.get("results", []):
-                    recipe_data = {
-                        "title": result.get("title", ""),
-                        "summary": result.get("content", "")[:300] + "...",
-                        "ingredients": [],  # Would need extraction logic
-                        "instructions": "See full recipe link",
-                        "source": "Tavily",
-                        "url": result.get("url", ""),
-                        "mcp_enhanced": False
-                    }
-                    recipes.append(recipe_data)
-
-            except Exception as e:
-                logger.warning(f"Tavily search error: {e}")
+        if len(recipes) < max_results:
+            recipes.extend(await _tavily_recipes(query, dietary_context, max_results - len(recipes)))
 
     except Exception as e:
-        logger.error(f"Enhanced recipe search error: {e}")
+        logger.error("Enhanced recipe search error: %s", e)
         # Fallback to original search method would go here
 
     return recipes[:max_results]
 
+async def stream_recipes_enhanced(
+    query: str,
+    dietary_context: str = "",
+    max_results: int = 10,
+    use_mcp: bool = True
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of search_recipes_enhanced: yields each recipe as soon as its
+    MCP analysis finishes (completion order), then any Tavily fallback results
+    """
+    sent = 0
+    try:
+        if use_mcp:
+            mcp_recipes = await mcp_client.search_enhanced_recipes(
+                query=query,
+                diet=dietary_context,
+                max_results=max_results
+            )
+            async for recipe in mcp_client.iter_enhanced_recipes(mcp_recipes[:max_results]):
+                sent += 1
+                yield recipe
+
+        if sent < max_results:
+            for recipe in await _tavily_recipes(query, dietary_context, max_results - sent):
+                yield recipe
+
+    except Exception as e:
+        logger.error("Enhanced recipe stream error: %s", e)
+
+async def _tavily_recipes(query: str, dietary_context: str, limit: int) -> List[Dict[str, Any]]:
+    """Tavily web results shaped like recipes; empty when Tavily is unconfigured or fails"""
+    if not get_tavily_api_key() or limit <= 0:
+        return []
+    recipes = []
+    try:
+        # Combine query with dietary context
+        search_query = f"{query} {dietary_context}".strip()
+        results = await tavily_search(search_query, limit, search_depth="advanced", include_images=False)
+
+        # Process Tavily results
+        for result in results:
+            recipe_data = {
+                "title": result.get("title", ""),
+                "summary": result.get("content", "")[:300] + "...",
+                "ingredients": [],  # Would need extraction logic
+                "instructions": "See full recipe link",
+                "source": "Tavily",
+                "url": result.get("url", ""),
+                "mcp_enhanced": False
+            }
+            recipes.append(recipe_data)
+
+    except Exception as e:
+        logger.warning("Tavily search error: %s", e)
+    return recipes
+
 async def get_recipe_nutrition(ingredients: List[str]) -> Dict[str, float]:
     """
     Get nutritional information for a list of ingredients
@@ -104,7 +129,7 @@ async def get_recipe_nutrition(ingredients: List[str]) -> Dict[str, float]:
             "fiber": nutrition.get("fiber", 0),
         }
     except Exception as e:
-        logger.error(f"Nutrition analysis error: {e}")
+        logger.error("Nutrition analysis error: %s", e)
         return {}
 
 async def analyze_recipe_health(recipe_data: Dict) -> Dict[str, Any]:
@@ -158,7 +183,7 @@ async def analyze_recipe_health(recipe_data: Dict) -> Dict[str, Any]:
         return analysis
 
     except Exception as e:
-        logger.error(f"Health analysis error: {e}")
+        logger.error("Health analysis error: %s", e)
         return {"health_score": 50, "insights": ["Unable to analyze"]}
 
 def get_api_status() -> Dict[str, Any]:
@@ -168,29 +193,21 @@ def get_api_status() -> Dict[str, Any]:
     Returns:
         Dictionary with API availability status
     """
-    from mcp_server import mcp_server
-
     status = {
         "mcp_available": True,
         "apis": {}
     }
 
     # Check Spoonacular
-    status["apis"]["spoonacular"] = bool(mcp_server.api_keys.get("spoonacular"))
+    status["apis"]["spoonacular"] = bool(os.getenv("SPOONACULAR_API_KEY"))
 
     # Check Edamam
-    status["apis"]["edamam"] = bool(
-        mcp_server.api_keys.get("edamam_app_id") and
-        mcp_server.api_keys.get("edamam_app_key")
-    )
+    status["apis"]["edamam"] = bool(os.getenv("EDAMAM_APP_ID") and os.getenv("EDAMAM_APP_KEY"))
 
     # Check Nutritionix
-    status["apis"]["nutritionix"] = bool(
-        mcp_server.api_keys.get("nutritionix_app_id") and
-        mcp_server.api_keys.get("nutritionix_app_key")
-    )
+    status["apis"]["nutritionix"] = bool(os.getenv("NUTRITIONIX_APP_ID") and os.getenv("NUTRITIONIX_APP_KEY"))
 
     # Check Tavily
-    status["apis"]["tavily"] = bool(tc)
+    status["apis"]["tavily"] = bool(get_tavily_api_key())
 
     return status
@@ -0,0 +1,25 @@
+"""
+Gunicorn settings for the backend.
+Chat and search requests spend nearly all their time waiting on Cohere/Tavily,
+so each worker runs a thread pool (gthread) instead of one request at a time.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '4000')}"
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+# LLM calls and SSE streams can run well past gunicorn's 30s default
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+keepalive = 5
+
+# Import the app (and run init_db) once in the master before forking: workers importing
+# it concurrently would race to create the schema on a fresh database
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Don't reuse pooled DB connections opened by the master (init_db) across the fork
+    from db import engine
+    engine.dispose(close=False)
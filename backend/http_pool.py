@@ -0,0 +1,47 @@
+"""
+Pooled async HTTP client for upstream APIs.
+Each event loop gets one long-lived httpx.AsyncClient, so repeated calls to the
+same host reuse kept-alive TCP/TLS connections instead of handshaking per call.
+httpx connections belong to the loop that opened them, hence one client per
+loop (in the app that is the single async_bridge loop).
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger("http_pool")
+
+_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "50")),
+    max_keepalive_connections=int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=30.0,
+)
+_TIMEOUT = httpx.Timeout(float(os.getenv("HTTP_POOL_TIMEOUT", "15")))
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the pooled client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _clients.get(loop)
+        if client is None or client.is_closed:
+            client = _clients[loop] = httpx.AsyncClient(limits=_LIMITS, timeout=_TIMEOUT)
+        return client
+
+
+async def aclose(loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+    """Close the client of the given (default: running) loop, e.g. before a test loop ends."""
+    loop = loop or asyncio.get_running_loop()
+    with _lock:
+        client = _clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
@@ -1,6 +1,11 @@
 import os
 import cohere
+import httpx
 import logging
+from typing import Iterator
+
+from prompt import build_messages
+from response_cache import ResponseCache, cached_call, cached_stream
 
 _co_client = None
 logger = logging.getLogger("llm")
@@ -15,10 +20,50 @@ def _get_client() -> cohere.Client:
         raise RuntimeError(
             "Missing Cohere API key. Set COHERE_API_KEY (preferred) or CO_API_KEY in backend/.env."
         )
-    _co_client = cohere.Client(api_key)
+    # One pooled keep-alive HTTP client for the process, reused across requests
+    http = httpx.Client(
+        timeout=300,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+    )
+    _co_client = cohere.Client(api_key, httpx_client=http)
     return _co_client
 
 
+def embed_text(text: str) -> list[float]:
+    """Embed a short query for semantic cache lookups."""
+    co = _get_client()
+    resp = co.embed(
+        texts=[text],
+        model=os.getenv("LLM_EMBED_MODEL", "embed-english-light-v3.0"),
+        input_type="search_query",
+        # a slow embed only costs a cache lookup, so never let it hold up generation
+        request_options={"timeout_in_seconds": int(os.getenv("LLM_EMBED_TIMEOUT", "2")), "max_retries": 0},
+    )
+    return list(resp.embeddings[0])
+
+
+# Shared by generate_reply and llm_graph.run_graph
+reply_cache = ResponseCache(embed_fn=embed_text)
+
+
+def _prompt(system_instructions: str, history: list[dict], user_message: str, extra_context: dict | None) -> list[dict]:
+    """Canonical role/content messages for a turn (see prompt.build_messages)."""
+    ctx = extra_context or {}
+    return build_messages(system_instructions, ctx, ctx.get("selectedRecipe"), None, history, user_message)
+
+
+def _legacy_chat_args(messages: list[dict]) -> tuple[str, list[dict]]:
+    """Split canonical messages into the legacy Chat API preamble and chat_history
+    (the final user turn is sent separately as `message`)."""
+    preamble = messages[0]["content"]
+    chat_history = [
+        {"role": "USER" if m["role"] == "user" else "CHATBOT", "message": m["content"]}
+        for m in messages[1:-1]
+    ]
+    return preamble, chat_history
+
+
+@cached_call(reply_cache)
 def generate_reply(system_instructions: str, history: list[dict], user_message: str, extra_context: dict | None = None) -> str:
     """
     Cohere chat helper.
@@ -26,24 +71,13 @@ def generate_reply(system_instructions: str, history: list[dict], user_message:
     extra_context: optional dict (e.g., health profile or selected recipe)
     """
     co = _get_client()
+    messages = _prompt(system_instructions, history, user_message, extra_context)
 
     # Prefer Responses API if available (newer SDKs)
     if hasattr(co, "responses") and hasattr(co.responses, "create"):
-        messages: list[dict] = []
-        preamble_parts = []
-        if system_instructions:
-            preamble_parts.append(system_instructions)
-        if extra_context:
-            preamble_parts.append(f"User health profile/context: {extra_context}")
-        # Some responses implementations accept a leading system message
-        if preamble_parts:
-            messages.append({"role": "system", "content": "\n\n".join(preamble_parts)})
-
-        for m in history[-12:]:
-            role = "user" if m.get("role") == "user" else "assistant"
-            messages.append({"role": role, "content": m.get("content", "")})
-        messages.append({"role": "user", "content": user_message})
-
+        # Leading system message only when there are instructions or context to send
+        if not messages[0]["content"]:
+            messages = messages[1:]
         resp = co.responses.create(
             model=os.getenv("LLM_MODEL", "command-a-03-2025"),
             messages=messages,
@@ -61,21 +95,7 @@ def generate_reply(system_instructions: str, history: list[dict], user_message:
             return str(resp).strip()
 
     # Fallback: legacy Chat API uses message + chat_history + preamble
-    preamble = ""
-    if system_instructions:
-        preamble += system_instructions
-    if extra_context:
-        preamble += ("\n\n" if preamble else "") + f"User health profile/context: {extra_context}"
-
-    # Convert history to Cohere chat history schema
-    chat_history = []
-    for m in history[-12:]:
-        role = m.get("role")
-        text = m.get("content", "")
-        if role == "user":
-            chat_history.append({"role": "USER", "message": text})
-        else:
-            chat_history.append({"role": "CHATBOT", "message": text})
+    preamble, chat_history = _legacy_chat_args(messages)
 
     resp = co.chat(
         model=os.getenv("LLM_MODEL", "command-a-03-2025"),
@@ -92,3 +112,26 @@ def generate_reply(system_instructions: str, history: list[dict], user_message:
     else:
         logger.warning(f"Legacy chat - No text found in response: {resp}")
         return str(resp).strip()
+
+
+@cached_stream(reply_cache)
+def generate_reply_stream(system_instructions: str, history: list[dict], user_message: str, extra_context: dict | None = None) -> Iterator[str]:
+    """
+    Streaming counterpart of generate_reply: yields text chunks as Cohere generates them.
+    """
+    co = _get_client()
+    preamble, chat_history = _legacy_chat_args(_prompt(system_instructions, history, user_message, extra_context))
+
+    total = 0
+    for event in co.chat_stream(
+        model=os.getenv("LLM_MODEL", "command-a-03-2025"),
+        message=user_message,
+        chat_history=chat_history if chat_history else None,
+        preamble=preamble or None,
+        temperature=0.4,  # Balanced for nutrition accuracy
+        max_tokens=2000,  # Ensure complete responses
+    ):
+        if event.event_type == "text-generation" and event.text:
+            total += len(event.text)
+            yield event.text
+    logger.info(f"Streamed chat response length: {total} characters")
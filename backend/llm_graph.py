@@ -1,15 +1,20 @@
 import os
+import re
 import time
 import logging
-from typing import Optional, List, Dict, Any, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Iterator, Sequence
 from typing_extensions import TypedDict, Annotated
 
 from langgraph.graph import StateGraph, END
 from langchain_cohere import ChatCohere
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 
+from prompt import HISTORY_TURNS, build_messages
 from recipes import search_recipes_tavily
-from db import SessionLocal
-from models import Message
+from db import SessionLocal, load_history
+from llm import reply_cache
+from response_cache import is_standalone
 
 
 class GraphState(TypedDict, total=False):
@@ -18,40 +23,55 @@ class GraphState(TypedDict, total=False):
     context: Annotated[Dict[str, Any], lambda x, y: y]
     needs_search: Annotated[bool, lambda x, y: y]
     route_taken: Annotated[str, lambda x, y: y]
+    search_future: Annotated[Optional[Future], lambda x, y: y]
     search_results: Annotated[List[Dict[str, Any]], lambda x, y: y]
     answer: Annotated[str, lambda x, y: y]
 
 
 logger = logging.getLogger("llm_graph")
 
+# Tavily lookups run here so _generate can assemble the prompt while the search is in flight
+_search_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SEARCH_WORKERS", "8")), thread_name_prefix="tavily")
+
+SYSTEM_INSTRUCTIONS = (
+    "You are a helpful health-focused cooking assistant. Personalize suggestions for wellness, "
+    "clear nutrition, and practical, quick steps. When relevant, provide ingredient substitutions, "
+    "prep tips, and portion guidance. Keep sodium and added sugars in check if the user indicates."
+)
+RESPONSE_GUIDANCE = (
+    "Provide a concise, actionable response with step-by-step guidance when appropriate. Cite links if used."
+)
+
+
+# Heuristic routing: search if the user asks for latest/web-backed info.
+# One precompiled alternation scans the query once instead of once per word. Triggers
+# match as word prefixes, so inflections still route to search ("newest", "searching",
+# "websites", "researchers", "studies", "trends") while "renew" or "cobweb" do not.
+_SEARCH_TRIGGER_RE = re.compile(
+    r"\b(?:latest|recent|news|stud|research|trend|new|202\d|google|web|online|search)",
+    re.IGNORECASE,
+)
+
 
 def _should_search(state: GraphState) -> GraphState:
     t0 = time.perf_counter()
-    q = (state.get("query") or "").lower()
-    # Heuristic routing: search if the user asks for latest/web-backed info
-    trigger_words = [
-        "latest",
-        "recent",
-        "news",
-        "study",
-        "research",
-        "trending",
-        "new",
-        "202",
-        "google",
-        "web",
-        "online",
-        "search",
-    ]
-    state["needs_search"] = any(w in q for w in trigger_words)
+    q = state.get("query") or ""
+    state["needs_search"] = bool(_SEARCH_TRIGGER_RE.search(q))
     state["route_taken"] = "search" if state["needs_search"] else "generate"
     logger.info("route decision: %s (needs_search=%s) query='%s' dt=%.3fms",
                 state["route_taken"], state["needs_search"], q[:120], (time.perf_counter()-t0)*1000)
     return state
 
 
-def _do_search(state: GraphState) -> GraphState:
+def _search(query: str, dietary_context: str) -> List[Dict[str, Any]]:
     t0 = time.perf_counter()
+    # Tavily web search via our recipes module (handles the API key and result caching)
+    results = search_recipes_tavily(query=query, dietary_context=dietary_context) or []
+    logger.info("search results: %d dt=%.3fms", len(results), (time.perf_counter()-t0)*1000)
+    return results
+
+
+def _do_search(state: GraphState) -> GraphState:
     # Build a dietary context string from provided context for better search
     ctx = state.get("context") or {}
     diet = ctx.get("diet") or ""
@@ -59,95 +79,67 @@ def _do_search(state: GraphState) -> GraphState:
     goals = ctx.get("goals") or ""
     dietary_context = ", ".join([p for p in [diet, allergens, goals] if p])
 
-    # Perform Tavily web search via our recipes module (already handles API key + caching)
+    # Start the search and hand the future to _generate, which awaits it only
+    # after building the parts of the prompt that don't depend on it
     query = state.get("query") or ""
-    results = search_recipes_tavily(query=query, dietary_context=dietary_context)
-    state["search_results"] = results or []
-    logger.info("search results: %d dt=%.3fms", len(state["search_results"]), (time.perf_counter()-t0)*1000)
+    state["search_future"] = _search_pool.submit(_search, query, dietary_context)
     return state
 
 
-def _generate(state: GraphState) -> GraphState:
-    t0 = time.perf_counter()
-    # Initialize Cohere chat via LangChain integration (reads COHERE_API_KEY from env)
-    llm = ChatCohere(model=os.getenv("LLM_MODEL", "command-a-03-2025"), temperature=0.4, max_tokens=2000)
+_llm: Optional[ChatCohere] = None
 
-    # System instructions + context
-    ctx = state.get("context") or {}
-    selected_recipe = ctx.get("selectedRecipe") or {}
-    health_profile = {
-        "diet": ctx.get("diet"),
-        "allergens": ctx.get("allergens"),
-        "goals": ctx.get("goals"),
-    }
 
-    system_instructions = (
-        "You are a helpful health-focused cooking assistant. Personalize suggestions for wellness, "
-        "clear nutrition, and practical, quick steps. When relevant, provide ingredient substitutions, "
-        "prep tips, and portion guidance. Keep sodium and added sugars in check if the user indicates."
-    )
+def _chat_model() -> ChatCohere:
+    # Built once per process so its Cohere HTTP client (and connection pool) stays warm.
+    # Lazy rather than at import: ChatCohere reads and validates COHERE_API_KEY on construction.
+    global _llm
+    if _llm is None:
+        _llm = ChatCohere(model=os.getenv("LLM_MODEL", "command-a-03-2025"), temperature=0.4, max_tokens=2000)
+    return _llm
 
-    search_snippets = ""
-    if state.get("search_results"):
-        parts = []
-        for r in state["search_results"][:5]:
-            title = r.get("title") or "Result"
-            url = r.get("url") or ""
-            snippet = r.get("snippet") or r.get("content") or ""
-            parts.append(f"- {title}: {snippet}\n  {url}")
-        search_snippets = "\n\nRecent findings (web):\n" + "\n".join(parts)
-
-    selected_snippet = ""
-    if selected_recipe:
-        selected_snippet = (
-            "\n\nSelected recipe context (from UI):\n"
-            f"Title: {selected_recipe.get('title','')}\n"
-            f"Ingredients: {', '.join(selected_recipe.get('ingredients', [])) if isinstance(selected_recipe.get('ingredients'), list) else selected_recipe.get('ingredients','')}\n"
-            f"Summary: {selected_recipe.get('summary','')}\n"
-        )
-
-    profile_snippet = (
-        "\n\nUser health profile:\n"
-        f"Diet: {health_profile.get('diet') or ''}\n"
-        f"Allergens: {health_profile.get('allergens') or ''}\n"
-        f"Goals: {health_profile.get('goals') or ''}\n"
-    )
 
-    # Include brief history for continuity
-    hist = state.get("history") or []
-    history_snippet_lines: List[str] = []
-    for m in hist[-10:]:
-        role = m.get("role", "user").upper()
-        content = (m.get("content") or "").strip()
-        if content:
-            history_snippet_lines.append(f"{role}: {content}")
-    history_snippet = "\n".join(history_snippet_lines)
+def _max_chars() -> int:
+    # Max output guard (characters); configurable via env
+    try:
+        return int(os.getenv("LLM_MAX_CHARS", "2500"))
+    except ValueError:
+        return 2500
+
 
-    user_query = state.get("query") or ""
+_LC_MESSAGE = {"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
 
-    prompt = f"""
-{system_instructions}
-{profile_snippet}{selected_snippet}{search_snippets}
 
-Prior conversation (latest first):
-{history_snippet}
+def _build_messages(state: GraphState) -> List[BaseMessage]:
+    ctx = state.get("context") or {}
 
-User request:
-{user_query}
+    # The web search is the only input still in flight; wait for it last
+    search_future = state.get("search_future")
+    if search_future is not None:
+        state["search_results"] = search_future.result()
+        state["search_future"] = None
+
+    messages = build_messages(
+        f"{SYSTEM_INSTRUCTIONS}\n\n{RESPONSE_GUIDANCE}",
+        ctx,
+        ctx.get("selectedRecipe"),
+        state.get("search_results"),
+        state.get("history") or [],
+        state.get("query") or "",
+    )
+    return [_LC_MESSAGE[m["role"]](content=m["content"]) for m in messages]
 
-Provide a concise, actionable response with step-by-step guidance when appropriate. Cite links if used.
-""".strip()
 
-    resp = llm.invoke(prompt)
+def _generate(state: GraphState) -> GraphState:
+    t0 = time.perf_counter()
+    llm = _chat_model()
+    messages = _build_messages(state)
+
+    resp = llm.invoke(messages)
     # lc messages often return an AIMessage with .content as string
     answer = getattr(resp, "content", None) or str(resp)
     answer = (answer or "").strip()
 
-    # Max output guard (characters); configurable via env
-    try:
-        max_chars = int(os.getenv("LLM_MAX_CHARS", "2500"))
-    except ValueError:
-        max_chars = 2500
+    max_chars = _max_chars()
     if len(answer) > max_chars:
         answer = answer[:max_chars].rstrip() + "\n\n...(trimmed)"
 
@@ -163,9 +155,8 @@ _graph.add_node("route", _should_search)
 _graph.add_node("search", _do_search)
 _graph.add_node("generate", _generate)
 
-# Edges: route -> search or generate
-_graph.add_edge("route", "search")
-_graph.add_edge("route", "generate")
+# Edges: route -> search or generate (chosen by _router below; static edges
+# out of "route" would fan out to both nodes and run generate twice)
 _graph.add_edge("search", "generate")
 _graph.add_edge("generate", END)
 
@@ -182,34 +173,74 @@ _graph.set_entry_point("route")
 _compiled = _graph.compile()
 
 
-def run_graph(session_id: str, user_message: str, selected_context: Optional[Dict[str, Any]] = None) -> str:
-    """Entry point used by app.py when use_graph is true.
-    selected_context is the object our UI sends for a selected recipe and/or health profile.
-    """
-    # Pull last 10 messages from DB for continuity
-    history: List[Dict[str, str]] = []
+def _initial_state(session_id: str, user_message: str, selected_context: Optional[Dict[str, Any]]) -> GraphState:
+    # Recent turns plus the just-persisted user message, which build_messages drops
     db = SessionLocal()
     try:
-        msgs = (
-            db.query(Message)
-            .filter(Message.session_id == session_id)
-            .order_by(Message.created_at.asc())
-            .all()
-        )
-        for m in msgs[-10:]:
-            history.append({"role": m.role, "content": m.content})
+        history: List[Dict[str, str]] = load_history(db, session_id, limit=HISTORY_TURNS + 1)
     finally:
         db.close()
 
     # Initialize all fields with default values
-    initial: GraphState = {
+    return {
         "query": user_message,
         "history": history,
         "context": selected_context or {},
         "needs_search": False,
         "route_taken": "",
+        "search_future": None,
         "search_results": [],
         "answer": ""
     }
-    final = _compiled.invoke(initial)
-    return final.get("answer", "")
+
+
+def run_graph(session_id: str, user_message: str, selected_context: Optional[Dict[str, Any]] = None) -> str:
+    """Entry point used by app.py when use_graph is true.
+    selected_context is the object our UI sends for a selected recipe and/or health profile.
+    """
+    initial = _initial_state(session_id, user_message, selected_context)
+
+    def _invoke() -> str:
+        final = _compiled.invoke(initial)
+        return final.get("answer", "")
+
+    # Repeat/paraphrased first questions are served from the shared reply cache, except
+    # when they route to web search: those answers must reflect fresh results
+    if is_standalone(initial["history"]) and not _SEARCH_TRIGGER_RE.search(user_message):
+        return reply_cache.get_or_call(SYSTEM_INSTRUCTIONS, user_message, selected_context, _invoke)
+    return _invoke()
+
+
+def run_graph_stream(session_id: str, user_message: str, selected_context: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """Streaming variant of run_graph used by /api/chat/stream.
+    Takes the same route -> search path as the compiled graph, then streams the
+    generate step from Cohere chunk by chunk instead of waiting for the full answer.
+    """
+    initial = _initial_state(session_id, user_message, selected_context)
+
+    def _stream() -> Iterator[str]:
+        t0 = time.perf_counter()
+        state = _should_search(initial)
+        if state.get("needs_search"):
+            state = _do_search(state)
+        llm = _chat_model()
+        messages = _build_messages(state)
+
+        max_chars = _max_chars()
+        sent = 0
+        for chunk in llm.stream(messages):
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            if not text:
+                continue
+            if sent + len(text) > max_chars:
+                yield text[:max_chars - sent].rstrip() + "\n\n...(trimmed)"
+                sent = max_chars
+                break
+            sent += len(text)
+            yield text
+        logger.info("generate stream done dt=%.3fms answer_chars=%d", (time.perf_counter()-t0)*1000, sent)
+
+    if is_standalone(initial["history"]) and not _SEARCH_TRIGGER_RE.search(user_message):
+        yield from reply_cache.get_or_stream(SYSTEM_INSTRUCTIONS, user_message, selected_context, _stream)
+    else:
+        yield from _stream()
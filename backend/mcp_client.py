@@ -3,110 +3,260 @@ MCP Client for Recipe Assistant
 Integrates MCP server with the existing LLM system
 """
 
+import os
+import copy
 import asyncio
-import json
+import hashlib
+import functools
 import logging
-from typing import Dict, List, Optional, Any
-from mcp_server import mcp_handler
+import threading
+import weakref
+from typing import Dict, List, Optional, Any, AsyncIterator, Awaitable, Callable, Hashable, Tuple
+import orjson
+from cachetools import LRUCache, TTLCache
+from batching import AsyncBatcher
+from mcp_server import RobustRecipeMCPServer, get_mcp_server
+from singleflight import SingleFlight
 
 logger = logging.getLogger("mcp-client")
 
+_CACHE_TTL = int(os.getenv("MCP_CACHE_TTL", "300"))
+_MAX_CONCURRENCY = int(os.getenv("MCP_MAX_CONCURRENCY", "8"))
+# Derived from the HTTP endpoint's budget (MCP_REQUEST_TIMEOUT, see mcp_endpoints) minus
+# headroom, so a slow upstream times out here and the fallback recipes are still
+# returned before the endpoint gives up with a 504
+_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", str(float(os.getenv("MCP_REQUEST_TIMEOUT", "10")) - 2)))
+
+# Recommendation thresholds for enhanced recipes
+_HEALTH_THRESH = 70
+_PROTEIN_THRESH = 15
+_REC_VEGETABLES = "Consider balancing this meal with additional vegetables"
+_REC_PROTEIN = "Add protein-rich ingredients for better satiety"
+
+
+def single_flight(key_func: Callable[..., Hashable] = lambda key, *args, **kwargs: key):
+    """Decorator for RecipeMCPClient coroutine methods: concurrent calls with the same key
+    (by default the first argument) share one execution instead of each hitting upstream"""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            key = (fn.__name__, key_func(*args, **kwargs))
+            return await self._single_flight(key, lambda: fn(self, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
 class RecipeMCPClient:
     """MCP Client for enhanced recipe functionality"""
 
+    def __init__(self, server: Optional[RobustRecipeMCPServer] = None):
+        # The recipe MCP server runs in-process; call its typed methods directly
+        # rather than building and dispatching a request dict per call.
+        # Without an explicit server the shared one is created on first use.
+        self._server = server
+        # Repeated/retried lookups from the UI are served from memory for MCP_CACHE_TTL seconds.
+        # The client may be awaited from more than one thread/loop (e.g. test scripts calling
+        # asyncio.run), so the caches sit behind a thread lock held only for the dict access.
+        self._cache_lock = threading.Lock()
+        self._search_cache = TTLCache(maxsize=256, ttl=_CACHE_TTL)
+        self._nutrition_cache = TTLCache(maxsize=256, ttl=_CACHE_TTL)
+        self._details_cache = TTLCache(maxsize=256, ttl=_CACHE_TTL)
+        # Analysis is a pure function of the recipe content, so it is memoized by content hash without a TTL
+        self._analysis_cache = LRUCache(maxsize=512)
+        # Concurrent identical calls share one in-flight future (per event loop)
+        self._flights = SingleFlight()
+        # At most MCP_MAX_CONCURRENCY upstream calls in flight, to protect free-tier quotas under bursts
+        self._semas: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        # Nutrition lookups arriving within 20ms are coalesced into one batch
+        self._nutrition_batcher = AsyncBatcher(self._nutrition_batch, max_batch_size=32, max_queue_time=0.02)
+
+    @property
+    def server(self) -> RobustRecipeMCPServer:
+        if self._server is None:
+            self._server = get_mcp_server()
+        return self._server
+
+    def _limit(self) -> asyncio.Semaphore:
+        """Semaphore bounding upstream calls on the running loop (one per loop, since
+        asyncio primitives can't be shared across loops)"""
+        loop = asyncio.get_running_loop()
+        with self._cache_lock:
+            sema = self._semas.get(loop)
+            if sema is None:
+                sema = self._semas[loop] = asyncio.Semaphore(_MAX_CONCURRENCY)
+            return sema
+
+    async def _call(self, coro: Awaitable[Any]) -> Any:
+        """Await an upstream server call within the concurrency cap and MCP_CALL_TIMEOUT,
+        so a slow API can't hold a slot forever"""
+        async with self._limit():
+            return await asyncio.wait_for(coro, _CALL_TIMEOUT)
+
+    async def _single_flight(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        return await self._flights.do(key, factory)
+
+    def _cache_get(self, cache: TTLCache, key: Hashable) -> Any:
+        with self._cache_lock:
+            return cache.get(key)
+
+    def _cache_put(self, cache: TTLCache, key: Hashable, value: Any) -> None:
+        # Empty results are what the error paths return, so they are never cached
+        if value:
+            with self._cache_lock:
+                cache[key] = value
+
+    def clear_cache(self) -> None:
+        with self._cache_lock:
+            for cache in (self._search_cache, self._nutrition_cache, self._details_cache, self._analysis_cache):
+                cache.clear()
+
     async def search_enhanced_recipes(self, query: str, diet: str = "", max_results: int = 10) -> List[Dict]:
         """Search for recipes with enhanced data from MCP servers"""
+        key = (query.casefold().strip(), diet, max_results)
+        # Copies, as in analyze_recipe_nutrition: callers stamp and edit the recipe dicts
+        cached = self._cache_get(self._search_cache, key)
+        if cached is not None:
+            return copy.deepcopy(cached)
         try:
-            # Use MCP to get enhanced recipe data
-            response = await mcp_handler.handle_request({
-                'method': 'search_recipes',
-                'params': {
-                    'query': query,
-                    'diet': diet,
-                    'max_results': max_results
-                }
-            })
-
-            if 'result' in response:
-                return response['result']
-            else:
-                logger.warning(f"MCP search failed: {response.get('error', 'Unknown error')}")
-                return []
+            return copy.deepcopy(await self._fetch_search(key, query, diet, max_results))
 
+        except asyncio.TimeoutError:
+            # Upstream too slow: serve the server's local fallback recipes (not cached)
+            logger.warning("MCP search timed out after %ss, using fallback recipes", _CALL_TIMEOUT)
+            return self.server.get_fallback_recipes(query, max_results)
         except Exception as e:
-            logger.error(f"MCP search error: {e}")
+            logger.error("MCP search error: %s", e)
             return []
 
+    @single_flight()
+    async def _fetch_search(self, key: Hashable, query: str, diet: str, max_results: int) -> List[Dict]:
+        # Use MCP to get enhanced recipe data
+        result = await self._call(self.server.search_recipes(query, diet, max_results))
+        self._cache_put(self._search_cache, key, result)
+        return result
+
     async def get_nutrition_analysis(self, ingredients: List[str]) -> Dict:
         """Get detailed nutrition analysis"""
+        key = tuple(sorted(ingredients))
+        cached = self._cache_get(self._nutrition_cache, key)
+        if cached is not None:
+            return copy.deepcopy(cached)
         try:
-            response = await mcp_handler.handle_request({
-                'method': 'get_nutrition',
-                'params': {'ingredients': ingredients}
-            })
-
-            if 'result' in response:
-                return response['result']
-            return {}
+            return copy.deepcopy(await self._fetch_nutrition(key))
 
         except Exception as e:
-            logger.error(f"Nutrition analysis error: {e}")
+            logger.error("Nutrition analysis error: %s", e)
             return {}
 
+    @single_flight()
+    async def _fetch_nutrition(self, key: Tuple[str, ...]) -> Dict:
+        result = await self._nutrition_batcher.process(key) or {}
+        self._cache_put(self._nutrition_cache, key, result)
+        return result
+
+    async def _nutrition_batch(self, keys: List[Tuple[str, ...]]) -> List[Any]:
+        """Serve a batch of ingredient lists: the server has no bulk endpoint, so identical
+        lists share one lookup and distinct ones run concurrently"""
+        unique = list(dict.fromkeys(keys))
+        results = await asyncio.gather(
+            *(self._call(self.server.get_nutrition_info(list(k))) for k in unique),
+            return_exceptions=True,
+        )
+        by_key = dict(zip(unique, results))
+        return [by_key[k] for k in keys]
+
     async def get_recipe_details(self, recipe_id: str, source: str = "spoonacular") -> Optional[Dict]:
         """Get detailed recipe information"""
+        key = (recipe_id, source)
+        cached = self._cache_get(self._details_cache, key)
+        if cached is not None:
+            return copy.deepcopy(cached)
         try:
-            response = await mcp_handler.handle_request({
-                'method': 'get_recipe',
-                'params': {
-                    'recipe_id': recipe_id,
-                    'source': source
-                }
-            })
-
-            if 'result' in response and response['result']:
-                return response['result']
-            return None
+            return copy.deepcopy(await self._fetch_details(key, recipe_id, source))
 
         except Exception as e:
-            logger.error(f"Recipe details error: {e}")
+            logger.error("Recipe details error: %s", e)
             return None
 
+    @single_flight()
+    async def _fetch_details(self, key: Hashable, recipe_id: str, source: str) -> Optional[Dict]:
+        result = await self._call(self.server.get_recipe_by_id(recipe_id, source))
+        self._cache_put(self._details_cache, key, result)
+        return result or None
+
     async def analyze_recipe_nutrition(self, recipe_data: Dict) -> Dict:
         """Analyze nutritional content of a recipe"""
+        key = hashlib.blake2b(
+            orjson.dumps(recipe_data, option=orjson.OPT_SORT_KEYS, default=str), digest_size=16
+        ).hexdigest()
+        # Callers get their own copy: the cached dict (and its nested lists) is shared by
+        # every later hit and by single-flight followers, and callers add keys to it
+        cached = self._cache_get(self._analysis_cache, key)
+        if cached is not None:
+            return copy.deepcopy(cached)
         try:
-            response = await mcp_handler.handle_request({
-                'method': 'analyze_nutrition',
-                'params': {'recipe_data': recipe_data}
-            })
-
-            if 'result' in response:
-                return response['result']
-            return {}
+            return copy.deepcopy(await self._fetch_analysis(key, recipe_data))
 
         except Exception as e:
-            logger.error(f"Nutrition analysis error: {e}")
+            logger.error("Nutrition analysis error: %s", e)
             return {}
 
+    @single_flight()
+    async def _fetch_analysis(self, key: str, recipe_data: Dict) -> Dict:
+        result = await self._call(self.server.analyze_nutrition(recipe_data)) or {}
+        self._cache_put(self._analysis_cache, key, result)
+        return result
+
+    @staticmethod
+    def _with_analysis(recipe: Dict, nutrition_analysis: Dict) -> Dict:
+        """Copy of recipe with the MCP analysis, recommendations and health score attached"""
+        # Add health recommendations (always a fresh list, so callers can extend it)
+        health_score = nutrition_analysis.get('health_score', 0)
+        protein = nutrition_analysis.get('protein_per_serving', 0)
+        recommendations = [
+            rec for low, rec in ((health_score < _HEALTH_THRESH, _REC_VEGETABLES), (protein < _PROTEIN_THRESH, _REC_PROTEIN))
+            if low
+        ]
+
+        # One sized allocation rather than copy() followed by three inserts
+        return {
+            **recipe,
+            'mcp_nutrition_analysis': nutrition_analysis,
+            'mcp_recommendations': recommendations,
+            'mcp_health_score': health_score,
+        }
+
     async def enhance_recipe_with_mcp(self, recipe: Dict) -> Dict:
         """Enhance a recipe with MCP data"""
-        enhanced = recipe.copy()
-
         # Get detailed nutrition analysis
         nutrition_analysis = await self.analyze_recipe_nutrition(recipe)
-        enhanced['mcp_nutrition_analysis'] = nutrition_analysis
-
-        # Add health recommendations
-        recommendations = []
-        if nutrition_analysis.get('health_score', 0) < 70:
-            recommendations.append("Consider balancing this meal with additional vegetables")
-        if nutrition_analysis.get('protein_per_serving', 0) < 15:
-            recommendations.append("Add protein-rich ingredients for better satiety")
+        return self._with_analysis(recipe, nutrition_analysis)
 
-        enhanced['mcp_recommendations'] = recommendations
-        enhanced['mcp_health_score'] = nutrition_analysis.get('health_score', 0)
+    async def enhance_recipes_with_mcp(self, recipes: List[Dict]) -> List[Dict]:
+        """Enhance a batch of recipes, running their analyses concurrently
+        (upstream calls are still capped by MCP_MAX_CONCURRENCY). Recipes are copied,
+        not enhanced in place: search results are shared with the search cache, and
+        adding keys would also change their content hash for the analysis cache."""
+        analyses = await asyncio.gather(*(self.analyze_recipe_nutrition(r) for r in recipes), return_exceptions=True)
+        return [
+            self._with_analysis(recipe, {} if isinstance(analysis, BaseException) else analysis)
+            for recipe, analysis in zip(recipes, analyses)
+        ]
 
-        return enhanced
+    async def iter_enhanced_recipes(self, recipes: List[Dict]) -> AsyncIterator[Dict]:
+        """Yield enhanced recipes in completion order, so the first ones can be sent
+        while the rest are still being analyzed"""
+        tasks = [asyncio.ensure_future(self.enhance_recipe_with_mcp(r)) for r in recipes]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Consumer went away early: don't leave analyses running for nobody
+            for task in tasks:
+                task.cancel()
 
 # Global MCP client instance
 mcp_client = RecipeMCPClient()
@@ -4,11 +4,19 @@ Provides REST API endpoints for MCP functionality
 """
 
 import os
-import json
+import time
 import logging
-from flask import Blueprint, request, jsonify
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Tuple
+
+import orjson
+from flask import Blueprint, Response, abort, request
 from flask_cors import CORS
-from enhanced_recipes import search_recipes_enhanced, get_recipe_nutrition, analyze_recipe_health, get_api_status
+from async_bridge import iter_async, run_async
+from llm import embed_text
+from response_cache import ResponseCache
+from enhanced_recipes import search_recipes_enhanced, stream_recipes_enhanced, get_recipe_nutrition, analyze_recipe_health, get_api_status
 
 logger = logging.getLogger("mcp-endpoints")
 
@@ -16,129 +24,283 @@ logger = logging.getLogger("mcp-endpoints")
 mcp_bp = Blueprint('mcp', __name__)
 CORS(mcp_bp)
 
+# Semantic cache in front of the enhanced search: paraphrased queries ("chicken curry" vs
+# "curry chicken") reuse earlier results via query-embedding similarity, with an exact
+# match tier checked first. Disable with MCP_SEMANTIC_CACHE=false.
+_search_cache = (
+    ResponseCache(
+        embed_fn=embed_text,
+        maxsize=1024,
+        ttl=float(os.getenv("MCP_SEARCH_CACHE_TTL", "900")),
+        similarity=float(os.getenv("MCP_SEARCH_SIMILARITY", "0.92")),
+    )
+    if os.getenv("MCP_SEMANTIC_CACHE", "true").lower() == "true"
+    else None
+)
+
+
+_ORJSON_OPTS = orjson.OPT_NON_STR_KEYS
+_MAX_BODY = int(os.getenv("MCP_MAX_BODY_BYTES", str(1024 * 1024)))
+# Upper bound for a whole MCP request; on expiry the work is cancelled and the client gets 504
+_REQUEST_TIMEOUT = float(os.getenv("MCP_REQUEST_TIMEOUT", "10"))
+
+
+def _body() -> Dict:
+    """Parse the JSON body with orjson; oversized bodies are rejected from Content-Length
+    before anything is read, and the raw bytes aren't kept on the request"""
+    # abort() with a Response sends that JSON error rather than Werkzeug's HTML page
+    if request.content_length and request.content_length > _MAX_BODY:
+        abort(Response(_ERR_TOO_LARGE, status=413, mimetype='application/json'))
+    try:
+        data = orjson.loads(request.get_data(cache=False) or b'{}')
+    except orjson.JSONDecodeError:
+        abort(_err400(_ERR_BAD_JSON))
+    return data if isinstance(data, dict) else {}
+
+
+def _json_bytes(payload, status: int = 200) -> Response:
+    """Serialize straight to bytes with orjson (no intermediate str as with jsonify)"""
+    return Response(orjson.dumps(payload, option=_ORJSON_OPTS), status=status, mimetype='application/json')
+
+
+# Fixed validation errors are serialized once. Each request still gets its own Response,
+# since after_request hooks (CORS) add headers to whatever object is returned.
+_ERR_QUERY = orjson.dumps({'error': 'Query is required'})
+_ERR_INGREDIENTS = orjson.dumps({'error': 'Ingredients are required'})
+_ERR_RECIPE = orjson.dumps({'error': 'Recipe data is required'})
+_ERR_TIMEOUT = orjson.dumps({'error': 'Upstream recipe services timed out'})
+_ERR_BAD_JSON = orjson.dumps({'error': 'Invalid JSON body'})
+_ERR_TOO_LARGE = orjson.dumps({'error': 'Request body too large'})
+
+
+def _err400(body: bytes) -> Response:
+    return Response(body, status=400, mimetype='application/json')
+
+
+def _err504() -> Response:
+    return Response(_ERR_TIMEOUT, status=504, mimetype='application/json')
+
+
+def _err500(message: str, details: str) -> Response:
+    return _json_bytes({'error': message, 'details': details}, status=500)
+
+
+def _stream_results(results: List[Dict]):
+    """Emit the search payload one recipe at a time instead of buffering the whole document"""
+    yield b'{"success":true,"results":['
+    for i, r in enumerate(results):
+        yield (b',' if i else b'') + orjson.dumps(r, option=_ORJSON_OPTS)
+    yield b'],"count":%d}' % len(results)
+
+
+def _search_enhanced_cached(query: str, dietary_context: str, max_results: int, use_mcp: bool) -> List[Dict]:
+    def search() -> List[Dict]:
+        return run_async(search_recipes_enhanced(
+            query=query,
+            dietary_context=dietary_context,
+            max_results=max_results,
+            use_mcp=use_mcp
+        ), timeout=_REQUEST_TIMEOUT)
+
+    if _search_cache is None:
+        return search()
+
+    results: List[Dict] = []
+
+    def compute() -> str:
+        results.extend(search())
+        # An empty string is never stored, so failed/empty searches are retried next time
+        return orjson.dumps(results).decode() if results else ""
+
+    # Only the query is embedded; the other options scope the match
+    scope = {"dietary_context": dietary_context, "max_results": max_results, "use_mcp": use_mcp}
+    cached = _search_cache.get_or_call("mcp-search", query.strip().lower(), scope, compute)
+    return results if results or not cached else orjson.loads(cached)
+
+
 @mcp_bp.route('/api/mcp/search', methods=['POST'])
-async def search_recipes_mcp():
+def search_recipes_mcp():
     """Enhanced recipe search with MCP integration"""
+    data = _body()
     try:
-        data = request.get_json()
         query = data.get('query', '')
         dietary_context = data.get('dietary_context', '')
         max_results = data.get('max_results', 10)
         use_mcp = data.get('use_mcp', True)
 
         if not query:
-            return jsonify({'error': 'Query is required'}), 400
+            return _err400(_ERR_QUERY)
 
         # Perform enhanced search
-        results = await search_recipes_enhanced(
+        results = _search_enhanced_cached(query, dietary_context, max_results, use_mcp)
+
+        return Response(_stream_results(results), mimetype='application/json')
+
+    except FutureTimeout:
+        logger.warning("MCP search timed out after %ss", _REQUEST_TIMEOUT)
+        return _err504()
+
+    except Exception as e:
+        logger.error("MCP search error: %s", e)
+        return _err500('Search failed', str(e))
+
+@mcp_bp.route('/api/mcp/search/stream', methods=['GET'])
+def stream_recipes_mcp():
+    """Enhanced recipe search as Server-Sent Events: one `data:` event per recipe as soon
+    as its analysis completes, then `event: end`. GET so EventSource can consume it."""
+    query = request.args.get('query', '').strip()
+    if not query:
+        return _err400(_ERR_QUERY)
+    dietary_context = request.args.get('dietary_context', '')
+    max_results = request.args.get('max_results', 10, type=int)
+    use_mcp = request.args.get('use_mcp', 'true').lower() == 'true'
+
+    def events():
+        count = 0
+        for recipe in iter_async(stream_recipes_enhanced(
             query=query,
             dietary_context=dietary_context,
             max_results=max_results,
             use_mcp=use_mcp
-        )
+        )):
+            count += 1
+            yield b'data: ' + orjson.dumps(recipe, option=_ORJSON_OPTS) + b'\n\n'
+        yield b'event: end\ndata: {"count":%d}\n\n' % count
 
-        return jsonify({
-            'success': True,
-            'results': results,
-            'count': len(results)
-        })
-
-    except Exception as e:
-        logger.error(f"MCP search error: {e}")
-        return jsonify({'error': 'Search failed', 'details': str(e)}), 500
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    }
+    return Response(events(), mimetype='text/event-stream', headers=headers)
 
 @mcp_bp.route('/api/mcp/nutrition', methods=['POST'])
-async def get_nutrition():
+def get_nutrition():
     """Get nutritional information for ingredients"""
+    data = _body()
     try:
-        data = request.get_json()
         ingredients = data.get('ingredients', [])
 
         if not ingredients:
-            return jsonify({'error': 'Ingredients are required'}), 400
+            return _err400(_ERR_INGREDIENTS)
 
-        nutrition = await get_recipe_nutrition(ingredients)
+        nutrition = run_async(get_recipe_nutrition(ingredients), timeout=_REQUEST_TIMEOUT)
 
-        return jsonify({
+        return _json_bytes({
             'success': True,
             'nutrition': nutrition
         })
 
+    except FutureTimeout:
+        logger.warning("Nutrition analysis timed out after %ss", _REQUEST_TIMEOUT)
+        return _err504()
+
     except Exception as e:
-        logger.error(f"Nutrition analysis error: {e}")
-        return jsonify({'error': 'Nutrition analysis failed', 'details': str(e)}), 500
+        logger.error("Nutrition analysis error: %s", e)
+        return _err500('Nutrition analysis failed', str(e))
 
 @mcp_bp.route('/api/mcp/analyze', methods=['POST'])
-async def analyze_health():
+def analyze_health():
     """Analyze health aspects of a recipe"""
+    data = _body()
     try:
-        data = request.get_json()
         recipe_data = data.get('recipe_data', {})
 
         if not recipe_data:
-            return jsonify({'error': 'Recipe data is required'}), 400
+            return _err400(_ERR_RECIPE)
 
-        analysis = await analyze_recipe_health(recipe_data)
+        analysis = run_async(analyze_recipe_health(recipe_data), timeout=_REQUEST_TIMEOUT)
 
-        return jsonify({
+        return _json_bytes({
             'success': True,
             'analysis': analysis
         })
 
+    except FutureTimeout:
+        logger.warning("Health analysis timed out after %ss", _REQUEST_TIMEOUT)
+        return _err504()
+
     except Exception as e:
-        logger.error(f"Health analysis error: {e}")
-        return jsonify({'error': 'Health analysis failed', 'details': str(e)}), 500
+        logger.error("Health analysis error: %s", e)
+        return _err500('Health analysis failed', str(e))
 
-@mcp_bp.route('/api/mcp/status', methods=['GET'])
-def get_mcp_status():
-    """Get MCP API status and availability"""
-    try:
-        status = get_api_status()
+# Status only changes when keys are configured, but dashboards poll it; serve the
+# serialized /status and /test bodies from memory for MCP_STATUS_TTL seconds.
+# Once built, an expired entry is still served while a single background
+# thread rebuilds it, so a poll never waits on get_api_status.
+_STATUS_TTL = float(os.getenv("MCP_STATUS_TTL", "10"))
+_status_cache = {'t': 0.0, 'status': None, 'test': None, 'refreshing': False}
+_status_lock = threading.Lock()
+_status_exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mcp-status")
 
-        return jsonify({
-            'success': True,
-            'status': status
-        })
-
-    except Exception as e:
-        logger.error(f"Status check error: {e}")
-        return jsonify({'error': 'Status check failed', 'details': str(e)}), 500
 
-@mcp_bp.route('/api/mcp/test', methods=['GET'])
-def test_mcp():
-    """Test MCP connectivity"""
+def _build_status() -> None:
     try:
-        # Test basic connectivity
         status = get_api_status()
 
+        # Test each available API
+        apis_available = [api_name for api_name, available in status['apis'].items() if available]
         test_results = {
             'mcp_server': 'available',
-            'apis_available': [],
-            'tests_passed': 0,
-            'tests_total': 0
+            'apis_available': apis_available,
+            'tests_passed': len(apis_available),
+            'tests_total': len(status['apis'])
         }
 
-        # Test each available API
-        test_results['tests_total'] = len(status['apis'])
-
-        for api_name, available in status['apis'].items():
-            if available:
-                test_results['apis_available'].append(api_name)
-                test_results['tests_passed'] += 1
-
-        return jsonify({
+        status_body = orjson.dumps({
+            'success': True,
+            'status': status
+        })
+        test_body = orjson.dumps({
             'success': True,
             'test_results': test_results,
             'message': f"MCP is operational. {test_results['tests_passed']}/{test_results['tests_total']} APIs available."
         })
+        with _status_lock:
+            _status_cache.update(t=time.monotonic(), status=status_body, test=test_body)
+    finally:
+        with _status_lock:
+            _status_cache['refreshing'] = False
+
+
+def _status_payloads() -> Tuple[bytes, bytes]:
+    with _status_lock:
+        cold = _status_cache['status'] is None
+        stale = cold or time.monotonic() - _status_cache['t'] >= _STATUS_TTL
+        if stale and not cold and not _status_cache['refreshing']:
+            _status_cache['refreshing'] = True
+            _status_exec.submit(_build_status)
+    if cold:
+        # Nothing to serve yet: build inline (errors reach the view's handler)
+        with _status_lock:
+            _status_cache['refreshing'] = True
+        _build_status()
+    with _status_lock:
+        return _status_cache['status'], _status_cache['test']
+
+
+@mcp_bp.route('/api/mcp/status', methods=['GET'])
+def get_mcp_status():
+    """Get MCP API status and availability"""
+    try:
+        return Response(_status_payloads()[0], mimetype='application/json')
+
+    except Exception as e:
+        logger.error("Status check error: %s", e)
+        return _err500('Status check failed', str(e))
+
+@mcp_bp.route('/api/mcp/test', methods=['GET'])
+def test_mcp():
+    """Test MCP connectivity"""
+    try:
+        return Response(_status_payloads()[1], mimetype='application/json')
 
     except Exception as e:
-        logger.error(f"MCP test error: {e}")
-        return jsonify({
+        logger.error("MCP test error: %s", e)
+        return _json_bytes({
             'success': False,
             'error': 'MCP test failed',
             'details': str(e)
-        }), 500
+        }, status=500)
 
 # Helper function to register MCP endpoints in main app
 def register_mcp_endpoints(app):
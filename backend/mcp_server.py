@@ -6,20 +6,256 @@ Uses only FREE APIs: TheMealDB, USDA, FatSecret, Spoonacular
 """
 
 import os
-import json
 import asyncio
+import functools
+import hashlib
 import logging
-import time
-from typing import Any, Dict, List, Optional, Sequence
-
-import requests
+import random
+import re
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
+import httpx
+import orjson
+from cachetools import TLRUCache
 from dotenv import load_dotenv
 
+from circuit_breaker import CircuitBreaker
+from http_pool import get_async_client
+from rate_limit import AsyncTokenBucket, RateLimited
+from singleflight import SingleFlight
+
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger("mcp-server")
 
+T = TypeVar("T")
+
+# Seconds an API is skipped after its circuit opens, before a single probe call
+_BREAK_DURATION = float(os.getenv("MCP_BREAKER_COOLDOWN", "60"))
+
+# Fail fast on unreachable hosts (connect) while allowing slow responses (read), so the
+# fallback chain can move on to the next API without waiting out one shared budget
+_UPSTREAM_TIMEOUT = httpx.Timeout(
+    10.0,
+    connect=float(os.getenv("MCP_CONNECT_TIMEOUT", "2")),
+    read=float(os.getenv("MCP_READ_TIMEOUT", "8")),
+)
+
+# Seconds the next recipe API waits on a slow (not yet failed) one before also starting
+_HEDGE_DELAY = float(os.getenv("MCP_HEDGE_DELAY", "0.3"))
+
+# Retries per upstream request, for connection errors and these statuses only
+_RETRIES = int(os.getenv("MCP_RETRIES", "1"))
+_RETRY_BACKOFF = 0.2
+_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+# Free-tier quotas; a call that would have to wait longer than
+# _RATE_LIMIT_MAX_WAIT seconds for a token skips the API instead
+_SPOONACULAR_PER_DAY = float(os.getenv("MCP_SPOONACULAR_PER_DAY", "150"))
+_USDA_PER_HOUR = float(os.getenv("MCP_USDA_PER_HOUR", "1000"))
+_RATE_LIMIT_MAX_WAIT = 1.0
+
+# Upstream response cache: entry cap and per-API TTLs (seconds)
+_RESPONSE_CACHE_SIZE = int(os.getenv("MCP_RESPONSE_CACHE_SIZE", "1024"))
+_TTL_MEALDB = 7 * 24 * 3600     # TheMealDB content rarely changes
+_TTL_USDA = 24 * 3600
+_TTL_SPOONACULAR = 3600         # also shields the 150/day free quota
+
+# USDA nutrientName substrings -> our field, checked in order ("Energy" also needs "kcal")
+_USDA_NUTRIENTS = (
+    (('Energy', 'kcal'), 'calories'),
+    (('Protein',), 'protein'),
+    (('Carbohydrate',), 'carbs'),
+    (('Total lipid',), 'fat'),
+    (('Fat',), 'fat'),
+    (('Fiber',), 'fiber'),
+)
+
+
+# Constant metadata stamped onto every recipe the server returns
+_ENHANCED_BY = 'FREE MCP'
+_API_COST = '$0'
+
+# Nutrient fields every nutrition provider reports
+_NUTRIENTS = ('calories', 'protein', 'carbs', 'fat', 'fiber')
+
+# Per-serving estimates by ingredient type, checked in priority order (substring match)
+_ESTIMATIONS = (
+    (('chicken', 'beef', 'fish', 'egg', 'tofu', 'beans', 'protein', 'turkey', 'pork'),
+     (('calories', 100), ('protein', 15))),       # high protein
+    (('rice', 'pasta', 'bread', 'potato', 'flour', 'sugar', 'noodles', 'quinoa'),
+     (('calories', 150), ('carbs', 30))),         # high carb
+    (('oil', 'butter', 'cheese', 'avocado', 'nuts', 'mayonnaise', 'cream'),
+     (('calories', 120), ('fat', 12))),           # high fat
+    (('lettuce', 'cucumber', 'tomato', 'celery', 'broth', 'water', 'tea'),
+     (('calories', 25), ('fiber', 3))),           # low calorie
+    (('vegetables', 'fruits', 'whole grain', 'beans', 'broccoli', 'spinach', 'kale'),
+     (('calories', 50), ('fiber', 8))),           # high fiber
+)
+_ESTIMATE_RULES = tuple(
+    (re.compile("|".join(map(re.escape, words))), increments) for words, increments in _ESTIMATIONS
+)
+_ESTIMATE_DEFAULT = (('calories', 75), ('carbs', 15))
+
+# TheMealDB spreads ingredients over fixed strIngredient1..20 fields
+_INGR_KEYS = tuple(f'strIngredient{i}' for i in range(1, 21))
+
+
+def _meal_ingredients(meal: Dict) -> List[str]:
+    return [v for v in map(meal.get, _INGR_KEYS) if v]
+
+
+def _parse_meal(meal: Dict) -> Dict:
+    return {
+        'title': meal.get('strMeal', ''),
+        'ingredients': _meal_ingredients(meal),
+        'instructions': meal.get('strInstructions', ''),
+        'category': meal.get('strCategory', ''),
+        'area': meal.get('strArea', ''),
+        'image': meal.get('strMealThumb', ''),
+        'youtube': meal.get('strYoutube', ''),
+        'source': 'TheMealDB',
+        'tags': meal.get('strTags', '').split(',') if meal.get('strTags') else [],
+    }
+
+
+def _parse_spoonacular(recipe: Dict) -> Dict:
+    return {
+        'title': recipe.get('title', ''),
+        'ingredients': [ing['name'] for ing in recipe.get('extendedIngredients', [])],
+        'instructions': recipe.get('instructions', ''),
+        'nutrition': recipe.get('nutrition', {}),
+        'readyInMinutes': recipe.get('readyInMinutes', 0),
+        'servings': recipe.get('servings', 1),
+        'image': recipe.get('image', ''),
+        'source': 'Spoonacular'
+    }
+
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _normalize_ingredient(ingredient: str) -> str:
+    return _WS_RE.sub(" ", ingredient).strip().casefold()
+
+
+@functools.lru_cache(maxsize=256)
+def _usda_field(name: str) -> Optional[str]:
+    """Map a USDA nutrient name to a nutrition field (None if untracked). The set of
+    names is small, so after warm-up every lookup is a dict hit."""
+    if 'per 100 g' in name.lower():
+        return None
+    for needles, field in _USDA_NUTRIENTS:
+        if all(n in name for n in needles):
+            return field
+    return None
+
+
+def _usda_totals(data: Dict) -> Dict:
+    """Nutrient totals of the top food in a USDA /foods/search response"""
+    totals = {}
+    for food in data.get('foods', [])[:1]:
+        for nutrient in food.get('foodNutrients', []):
+            # Per-100 g / gram-unit entries are skipped (no serving conversion yet)
+            if nutrient.get('unitName', '') == 'g':
+                continue
+            field = _usda_field(nutrient.get('nutrientName', ''))
+            if field:
+                totals[field] = totals.get(field, 0) + nutrient.get('value', 0)
+    return totals
+
+
+class NutritionResult(NamedTuple):
+    """A nutrition provider's totals; empty is set by the provider when it found nothing,
+    so the fallback loop doesn't have to scan the values"""
+    data: Dict[str, float]
+    empty: bool
+
+
+# High-quality fallback recipes served when every recipe API fails
+_FALLBACK_RECIPES = {
+    "chicken": {
+        "title": "Simple Grilled Chicken",
+        "ingredients": ["chicken breast", "olive oil", "salt", "pepper", "garlic powder"],
+        "instructions": "1. Season chicken breast with salt, pepper, and garlic powder.\n2. Brush with olive oil.\n3. Grill for 6-7 minutes per side until internal temperature reaches 165°F.\n4. Let rest for 5 minutes before serving.",
+        "category": "Main Course",
+        "readyInMinutes": 20,
+        "servings": 2,
+        "source": "Fallback Recipe",
+        "image": "https://via.placeholder.com/300x200?text=Grilled+Chicken",
+        "nutrition": {"calories": 350, "protein": 30, "carbs": 2, "fat": 15},
+        "tags": ["healthy", "high-protein", "low-carb"]
+    },
+    "salad": {
+        "title": "Fresh Garden Salad",
+        "ingredients": ["mixed greens", "cherry tomatoes", "cucumber", "red onion", "olive oil", "balsamic vinegar", "feta cheese"],
+        "instructions": "1. Wash and chop all vegetables.\n2. In a large bowl, combine mixed greens, tomatoes, cucumber, and red onion.\n3. Drizzle with olive oil and balsamic vinegar.\n4. Top with crumbled feta cheese.\n5. Toss gently and serve immediately.",
+        "category": "Salad",
+        "readyInMinutes": 10,
+        "servings": 2,
+        "source": "Fallback Recipe",
+        "image": "https://via.placeholder.com/300x200?text=Garden+Salad",
+        "nutrition": {"calories": 180, "protein": 6, "carbs": 12, "fat": 12},
+        "tags": ["healthy", "vegetarian", "low-calorie"]
+    },
+    "pasta": {
+        "title": "Simple Pasta Aglio e Olio",
+        "ingredients": ["spaghetti", "garlic", "olive oil", "red pepper flakes", "parsley", "parmesan cheese"],
+        "instructions": "1. Cook spaghetti according to package directions until al dente.\n2. While pasta cooks, mince garlic and chop parsley.\n3. Heat olive oil in a large pan over medium heat.\n4. Add garlic and red pepper flakes, sauté for 2 minutes.\n5. Drain pasta, reserving 1 cup pasta water.\n6. Add pasta to pan with garlic oil.\n7. Toss with parsley and parmesan cheese.\n8. Add pasta water as needed for sauce consistency.",
+        "category": "Main Course",
+        "readyInMinutes": 15,
+        "servings": 2,
+        "source": "Fallback Recipe",
+        "image": "https://via.placeholder.com/300x200?text=Pasta+Aglio+e+Olio",
+        "nutrition": {"calories": 450, "protein": 15, "carbs": 65, "fat": 18},
+        "tags": ["classic", "italian", "vegetarian"]
+    },
+    "quinoa": {
+        "title": "Mediterranean Quinoa Bowl",
+        "ingredients": ["quinoa", "chickpeas", "feta cheese", "cherry tomatoes", "cucumber", "red onion", "olive oil", "lemon juice"],
+        "instructions": "1. Cook quinoa according to package directions.\n2. Drain and rinse chickpeas.\n3. Chop tomatoes, cucumber, and red onion.\n4. In a bowl, combine cooked quinoa, chickpeas, and chopped vegetables.\n5. Dress with olive oil and lemon juice.\n6. Top with crumbled feta cheese.",
+        "category": "Main Course",
+        "readyInMinutes": 25,
+        "servings": 2,
+        "source": "Fallback Recipe",
+        "image": "https://via.placeholder.com/300x200?text=Quinoa+Bowl",
+        "nutrition": {"calories": 420, "protein": 18, "carbs": 55, "fat": 16},
+        "tags": ["healthy", "vegetarian", "high-fiber"]
+    },
+    "soup": {
+        "title": "Chicken Vegetable Soup",
+        "ingredients": ["chicken breast", "carrots", "celery", "onion", "chicken broth", "garlic", "thyme", "bay leaf"],
+        "instructions": "1. Dice chicken breast, carrots, celery, and onion.\n2. Mince garlic.\n3. In a large pot, sauté onion and garlic in a little oil.\n4. Add diced chicken and cook until browned.\n5. Add carrots, celery, broth, thyme, and bay leaf.\n6. Bring to boil, then simmer for 20 minutes.\n7. Season with salt and pepper to taste.",
+        "category": "Soup",
+        "readyInMinutes": 30,
+        "servings": 4,
+        "source": "Fallback Recipe",
+        "image": "https://via.placeholder.com/300x200?text=Chicken+Soup",
+        "nutrition": {"calories": 180, "protein": 22, "carbs": 12, "fat": 4},
+        "tags": ["healthy", "comfort-food", "low-fat"]
+    }
+}
+
+_FALLBACK_LIST = tuple(_FALLBACK_RECIPES.values())
+
+
+def _fallback_phrases() -> Tuple[Tuple[str, Tuple[int, ...]], ...]:
+    """Each distinct match phrase (recipe keyword or ingredient) with the indices of the
+    _FALLBACK_LIST recipes it selects"""
+    phrases: Dict[str, List[int]] = {}
+    for i, (keyword, recipe) in enumerate(_FALLBACK_RECIPES.items()):
+        for phrase in dict.fromkeys((keyword, *recipe["ingredients"])):
+            phrases.setdefault(phrase, []).append(i)
+    return tuple((phrase, tuple(indices)) for phrase, indices in phrases.items())
+
+
+# Matching is a linear substring scan over these ~30 phrases (so "chickens" still finds
+# chicken); grouping them only means a phrase shared by several recipes is tested once
+_FALLBACK_PHRASES = _fallback_phrases()
+
+
 class RobustRecipeMCPServer:
     """MCP Server with comprehensive fallback system using FREE APIs"""
 
@@ -36,12 +272,20 @@ class RobustRecipeMCPServer:
             'spoonacular': 'https://api.spoonacular.com',
         }
 
-        # Comprehensive API health tracking
-        self.api_health = {
-            'themealdb': {'available': True, 'last_success': time.time(), 'failures': 0},
-            'usda': {'available': True, 'last_success': time.time(), 'failures': 0},
-            'fatsecret': {'available': True, 'last_success': time.time(), 'failures': 0},
-            'spoonacular': {'available': True, 'last_success': time.time(), 'failures': 0},
+        # Per-API circuit breakers: skip an API after repeated failures, re-probe after a cool-down
+        self.breakers: Dict[str, CircuitBreaker] = {
+            name: CircuitBreaker(name, break_duration=_BREAK_DURATION)
+            for name in ('themealdb', 'usda', 'fatsecret', 'spoonacular')
+        }
+
+        # Upstream JSON responses; each entry expires after its own TTL (stored with it)
+        self._responses = TLRUCache(maxsize=_RESPONSE_CACHE_SIZE, ttu=lambda _k, v, now: now + v[0])
+        self._response_lock = threading.Lock()
+        self._flights = SingleFlight()
+        # Outbound budgets for metered APIs, keyed by the name passed to _call_api
+        self._limiters = {
+            'Spoonacular': AsyncTokenBucket('Spoonacular', rate=_SPOONACULAR_PER_DAY / 86400, burst=5),
+            'USDA': AsyncTokenBucket('USDA', rate=_USDA_PER_HOUR / 3600, burst=20),
         }
 
         logger.info("🚀 RobustRecipeMCPServer initialized with FREE APIs")
@@ -57,35 +301,25 @@ class RobustRecipeMCPServer:
             ('spoonacular', 'search_recipes_spoonacular'),
         ]
 
+        # Hedged: each API starts as soon as the one before it finishes without results,
+        # or after MCP_HEDGE_DELAY if that one is still waiting; first non-empty answer wins
+        attempts: List[asyncio.Task] = []
         for api_name, method_name in api_priority:
-            if not self.api_health[api_name]['available']:
-                logger.warning(f"⏭️ Skipping {api_name} - marked as unavailable")
-                sources_tried.append(f"{api_name}(unavailable)")
-                continue
-
-            try:
-                method = getattr(self, method_name)
-                api_recipes = await method(query, max_results)
-                sources_tried.append(api_name)
-
+            previous = attempts[-1] if attempts else None
+            attempts.append(asyncio.ensure_future(
+                self._search_attempt(api_name, method_name, query, max_results, previous, sources_tried)
+            ))
+        try:
+            for attempt in asyncio.as_completed(attempts):
+                api_recipes = await attempt
                 if api_recipes:
-                    logger.info(f"✅ {api_name} returned {len(api_recipes)} recipes")
                     recipes.extend(api_recipes)
-                    self.api_health[api_name]['last_success'] = time.time()
-                    self.api_health[api_name]['failures'] = 0
-                    break  # Success, stop trying other APIs
-                else:
-                    logger.warning(f"⚠️ {api_name} returned no results")
-
-            except Exception as e:
-                logger.error(f"❌ {api_name} failed: {e}")
-                self.api_health[api_name]['failures'] += 1
-                sources_tried.append(f"{api_name}(failed)")
-
-                # Mark as unavailable after 3 failures
-                if self.api_health[api_name]['failures'] >= 3:
-                    self.api_health[api_name]['available'] = False
-                    logger.error(f"🚫 {api_name} marked as unavailable after 3 failures")
+                    break  # Success, stop the other APIs
+        finally:
+            # Safe for concurrent searches: a loser only stops waiting on its upstream
+            # fetch; _call_api's single-flight task keeps running for any other caller
+            for attempt in attempts:
+                attempt.cancel()
 
         # If no API worked, return fallback recipes
         if not recipes:
@@ -93,15 +327,63 @@ class RobustRecipeMCPServer:
             recipes = self.get_fallback_recipes(query, max_results)
             sources_tried.append("fallback")
 
-        # Add metadata about sources tried and fallback status
+        # Add metadata about sources tried and fallback status (one shared stamp;
+        # the tuple keeps a later edit on one recipe from leaking into the others)
+        recipes = recipes[:max_results]
+        stamp = {
+            '_sources_tried': tuple(sources_tried),
+            '_fallback_used': len(sources_tried) > 1,
+            '_enhanced_by': _ENHANCED_BY,
+            '_api_cost': _API_COST,
+        }
         for recipe in recipes:
-            recipe['_sources_tried'] = sources_tried
-            recipe['_fallback_used'] = len(sources_tried) > 1
-            recipe['_enhanced_by'] = 'FREE MCP'
-            recipe['_api_cost'] = '$0'
+            recipe.update(stamp)
+
+        logger.info("📊 Search complete: %d recipes from %s", len(recipes), sources_tried)
+        return recipes
+
+    async def _search_attempt(
+        self,
+        api_name: str,
+        method_name: str,
+        query: str,
+        max_results: int,
+        previous: Optional[asyncio.Task],
+        sources_tried: List[str],
+    ) -> List[Dict]:
+        """One API's turn in search_recipes_with_fallback; failures are recorded and yield []"""
+        if previous is not None:
+            await asyncio.wait({previous}, timeout=_HEDGE_DELAY)
+            if previous.done() and not previous.cancelled() and previous.result():
+                return []  # the earlier API already answered
+
+        breaker = self.breakers[api_name]
+        if not breaker.allow_request():
+            logger.warning("⏭️ Skipping %s - circuit open", api_name)
+            sources_tried.append(f"{api_name}(unavailable)")
+            return []
 
-        logger.info(f"📊 Search complete: {len(recipes)} recipes from {sources_tried}")
-        return recipes[:max_results]
+        try:
+            method = getattr(self, method_name)
+            api_recipes = await method(query, max_results)
+        except RateLimited as e:
+            # Our own quota guard, not an API failure: skip without tripping the breaker
+            logger.warning("⏭️ Skipping %s - %s", api_name, e)
+            sources_tried.append(f"{api_name}(rate-limited)")
+            return []
+        except Exception as e:
+            logger.error("❌ %s failed: %s", api_name, e)
+            breaker.record_failure()
+            sources_tried.append(f"{api_name}(failed)")
+            return []
+
+        sources_tried.append(api_name)
+        breaker.record_success()
+        if api_recipes:
+            logger.info("✅ %s returned %d recipes", api_name, len(api_recipes))
+        else:
+            logger.warning("⚠️ %s returned no results", api_name)
+        return api_recipes
 
     async def get_nutrition_with_fallback(self, ingredients: List[str]) -> Dict:
         """Get nutrition with multiple fallback sources"""
@@ -115,7 +397,8 @@ class RobustRecipeMCPServer:
         ]
 
         for api_name, method_name in nutrition_apis:
-            if not self.api_health[api_name]['available']:
+            breaker = self.breakers[api_name]
+            if not breaker.allow_request():
                 sources_tried.append(f"{api_name}(unavailable)")
                 continue
 
@@ -123,17 +406,19 @@ class RobustRecipeMCPServer:
                 method = getattr(self, method_name)
                 result = await method(ingredients)
                 sources_tried.append(api_name)
+                breaker.record_success()
 
-                if any(result.values()):  # If we got any nutrition data
-                    nutrition_results[api_name] = result
-                    self.api_health[api_name]['last_success'] = time.time()
-                    self.api_health[api_name]['failures'] = 0
-                    logger.info(f"✅ {api_name} provided nutrition data")
+                if not result.empty:  # If we got any nutrition data
+                    nutrition_results[api_name] = result.data
+                    logger.info("✅ %s provided nutrition data", api_name)
                     break  # Success, use this data
 
+            except RateLimited as e:
+                logger.warning("⏭️ Skipping %s - %s", api_name, e)
+                sources_tried.append(f"{api_name}(rate-limited)")
             except Exception as e:
-                logger.error(f"❌ {api_name} nutrition failed: {e}")
-                self.api_health[api_name]['failures'] += 1
+                logger.error("❌ %s nutrition failed: %s", api_name, e)
+                breaker.record_failure()
                 sources_tried.append(f"{api_name}(failed)")
 
         # Merge nutrition data from multiple sources
@@ -148,319 +433,205 @@ class RobustRecipeMCPServer:
         final_nutrition['_sources_tried'] = sources_tried
         final_nutrition['_nutrition_cost'] = '$0'
 
-        logger.info(f"🥗 Nutrition analysis complete from {sources_tried}")
+        logger.info("🥗 Nutrition analysis complete from %s", sources_tried)
         return final_nutrition
 
     def merge_nutrition_data(self, nutrition_results: Dict) -> Dict:
         """Merge nutrition data from multiple sources intelligently"""
         if not nutrition_results:
-            return {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0}
+            return dict.fromkeys(_NUTRIENTS, 0)
 
-        # Start with zeros
-        merged = {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0}
-
-        # Take the highest value for each nutrient (most likely to be accurate)
-        for source, data in nutrition_results.items():
-            for nutrient, value in data.items():
-                if isinstance(value, (int, float)) and value > merged.get(nutrient, 0):
-                    merged[nutrient] = value
+        # Take the highest value for each nutrient (most likely to be accurate), never below 0
+        sources = list(nutrition_results.values())
+        merged = {
+            nutrient: max([0, *(data.get(nutrient) or 0 for data in sources)])
+            for nutrient in _NUTRIENTS
+        }
 
-        logger.info(f"📊 Merged nutrition from {len(nutrition_results)} sources")
+        logger.info("📊 Merged nutrition from %d sources", len(nutrition_results))
         return merged
 
     def estimate_nutrition(self, ingredients: List[str]) -> Dict:
         """Smart nutrition estimation when APIs fail"""
-        # Basic estimations per ingredient type
-        estimations = {
-            'protein': ['chicken', 'beef', 'fish', 'egg', 'tofu', 'beans', 'protein', 'turkey', 'pork'],
-            'high_carb': ['rice', 'pasta', 'bread', 'potato', 'flour', 'sugar', 'noodles', 'quinoa'],
-            'high_fat': ['oil', 'butter', 'cheese', 'avocado', 'nuts', 'mayonnaise', 'cream'],
-            'high_fiber': ['vegetables', 'fruits', 'whole grain', 'beans', 'broccoli', 'spinach', 'kale'],
-            'low_cal': ['lettuce', 'cucumber', 'tomato', 'celery', 'broth', 'water', 'tea']
-        }
-
-        estimated = {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0}
+        estimated = dict.fromkeys(_NUTRIENTS, 0)
 
         for ingredient in ingredients:
             ingredient_lower = ingredient.lower()
 
-            # Estimate calories based on ingredient type
-            if any(word in ingredient_lower for word in estimations['protein']):
-                estimated['calories'] += 100  # High protein = ~100 cal per serving
-                estimated['protein'] += 15
-            elif any(word in ingredient_lower for word in estimations['high_carb']):
-                estimated['calories'] += 150  # High carb = ~150 cal per serving
-                estimated['carbs'] += 30
-            elif any(word in ingredient_lower for word in estimations['high_fat']):
-                estimated['calories'] += 120  # High fat = ~120 cal per serving
-                estimated['fat'] += 12
-            elif any(word in ingredient_lower for word in estimations['low_cal']):
-                estimated['calories'] += 25   # Low calorie vegetables = ~25 cal per serving
-                estimated['fiber'] += 3
-            elif any(word in ingredient_lower for word in estimations['high_fiber']):
-                estimated['calories'] += 50   # High fiber = ~50 cal per serving
-                estimated['fiber'] += 8
+            # Estimate based on the first matching ingredient type
+            for pattern, increments in _ESTIMATE_RULES:
+                if pattern.search(ingredient_lower):
+                    break
             else:
-                estimated['calories'] += 75   # Default estimate
-                estimated['carbs'] += 15
+                increments = _ESTIMATE_DEFAULT
+            for nutrient, amount in increments:
+                estimated[nutrient] += amount
 
-        logger.info(f"🧮 Estimated nutrition for {len(ingredients)} ingredients")
+        logger.info("🧮 Estimated nutrition for %d ingredients", len(ingredients))
         return estimated
 
     def get_fallback_recipes(self, query: str, max_results: int) -> List[Dict]:
         """High-quality fallback recipes when all APIs fail"""
-        fallback_recipes = {
-            "chicken": {
-                "title": "Simple Grilled Chicken",
-                "ingredients": ["chicken breast", "olive oil", "salt", "pepper", "garlic powder"],
-                "instructions": "1. Season chicken breast with salt, pepper, and garlic powder.\n2. Brush with olive oil.\n3. Grill for 6-7 minutes per side until internal temperature reaches 165°F.\n4. Let rest for 5 minutes before serving.",
-                "category": "Main Course",
-                "readyInMinutes": 20,
-                "servings": 2,
-                "source": "Fallback Recipe",
-                "image": "https://via.placeholder.com/300x200?text=Grilled+Chicken",
-                "nutrition": {"calories": 350, "protein": 30, "carbs": 2, "fat": 15},
-                "tags": ["healthy", "high-protein", "low-carb"]
-            },
-            "salad": {
-                "title": "Fresh Garden Salad",
-                "ingredients": ["mixed greens", "cherry tomatoes", "cucumber", "red onion", "olive oil", "balsamic vinegar", "feta cheese"],
-                "instructions": "1. Wash and chop all vegetables.\n2. In a large bowl, combine mixed greens, tomatoes, cucumber, and red onion.\n3. Drizzle with olive oil and balsamic vinegar.\n4. Top with crumbled feta cheese.\n5. Toss gently and serve immediately.",
-                "category": "Salad",
-                "readyInMinutes": 10,
-                "servings": 2,
-                "source": "Fallback Recipe",
-                "image": "https://via.placeholder.com/300x200?text=Garden+Salad",
-                "nutrition": {"calories": 180, "protein": 6, "carbs": 12, "fat": 12},
-                "tags": ["healthy", "vegetarian", "low-calorie"]
-            },
-            "pasta": {
-                "title": "Simple Pasta Aglio e Olio",
-                "ingredients": ["spaghetti", "garlic", "olive oil", "red pepper flakes", "parsley", "parmesan cheese"],
-                "instructions": "1. Cook spaghetti according to package directions until al dente.\n2. While pasta cooks, mince garlic and chop parsley.\n3. Heat olive oil in a large pan over medium heat.\n4. Add garlic and red pepper flakes, sauté for 2 minutes.\n5. Drain pasta, reserving 1 cup pasta water.\n6. Add pasta to pan with garlic oil.\n7. Toss with parsley and parmesan cheese.\n8. Add pasta water as needed for sauce consistency.",
-                "category": "Main Course",
-                "readyInMinutes": 15,
-                "servings": 2,
-                "source": "Fallback Recipe",
-                "image": "https://via.placeholder.com/300x200?text=Pasta+Aglio+e+Olio",
-                "nutrition": {"calories": 450, "protein": 15, "carbs": 65, "fat": 18},
-                "tags": ["classic", "italian", "vegetarian"]
-            },
-            "quinoa": {
-                "title": "Mediterranean Quinoa Bowl",
-                "ingredients": ["quinoa", "chickpeas", "feta cheese", "cherry tomatoes", "cucumber", "red onion", "olive oil", "lemon juice"],
-                "instructions": "1. Cook quinoa according to package directions.\n2. Drain and rinse chickpeas.\n3. Chop tomatoes, cucumber, and red onion.\n4. In a bowl, combine cooked quinoa, chickpeas, and chopped vegetables.\n5. Dress with olive oil and lemon juice.\n6. Top with crumbled feta cheese.",
-                "category": "Main Course",
-                "readyInMinutes": 25,
-                "servings": 2,
-                "source": "Fallback Recipe",
-                "image": "https://via.placeholder.com/300x200?text=Quinoa+Bowl",
-                "nutrition": {"calories": 420, "protein": 18, "carbs": 55, "fat": 16},
-                "tags": ["healthy", "vegetarian", "high-fiber"]
-            },
-            "soup": {
-                "title": "Chicken Vegetable Soup",
-                "ingredients": ["chicken breast", "carrots", "celery", "onion", "chicken broth", "garlic", "thyme", "bay leaf"],
-                "instructions": "1. Dice chicken breast, carrots, celery, and onion.\n2. Mince garlic.\n3. In a large pot, sauté onion and garlic in a little oil.\n4. Add diced chicken and cook until browned.\n5. Add carrots, celery, broth, thyme, and bay leaf.\n6. Bring to boil, then simmer for 20 minutes.\n7. Season with salt and pepper to taste.",
-                "category": "Soup",
-                "readyInMinutes": 30,
-                "servings": 4,
-                "source": "Fallback Recipe",
-                "image": "https://via.placeholder.com/300x200?text=Chicken+Soup",
-                "nutrition": {"calories": 180, "protein": 22, "carbs": 12, "fat": 4},
-                "tags": ["healthy", "comfort-food", "low-fat"]
-            }
-        }
-
-        # Find matching fallback recipes
-        matching = []
+        # Find matching fallback recipes: a recipe matches when its keyword or any of
+        # its ingredients appears in the query
         query_lower = query.lower()
-
-        for keyword, recipe in fallback_recipes.items():
-            if keyword in query_lower or any(word in query_lower for word in recipe["ingredients"]):
-                matching.append(recipe)
-
-        # If no matches, return the first recipe (chicken) as default
-        return matching[:max_results] if matching else [list(fallback_recipes.values())[0]]
+        hits = set()
+        for phrase, indices in _FALLBACK_PHRASES:
+            if phrase in query_lower:
+                hits.update(indices)
+        matching = [_FALLBACK_LIST[i] for i in sorted(hits)[:max_results]]
+
+        # If no matches, return the first recipe (chicken) as default.
+        # Copies, since callers stamp per-request metadata onto the returned dicts.
+        return [dict(recipe) for recipe in matching or _FALLBACK_LIST[:1]]
+
+    async def _call_api(self, api: str, url: str, params: Dict, ttl: float, parser: Callable[[Any], T]) -> T:
+        """GET url and return parser(JSON body); the shared path for every upstream API.
+        Successful responses are cached for ttl seconds (keyed by a hash of the URL and
+        params) and concurrent misses share one request. Non-200 answers and network
+        errors raise, labelled with the API name."""
+        key = hashlib.blake2b(
+            url.encode() + b"|" + orjson.dumps(params, option=orjson.OPT_SORT_KEYS), digest_size=16
+        ).hexdigest()
+        with self._response_lock:
+            hit = self._responses.get(key)
+        if hit is None:
+            try:
+                data = await self._flights.do(key, lambda: self._fetch_json(api, key, url, params, ttl))
+            except httpx.HTTPError as e:
+                logger.error("%s network error: %s", api, e)
+                raise Exception(f"{api} network error: {e}")
+        else:
+            data = hit[1]
+        return parser(data)
+
+    async def _fetch_json(self, api: str, key: str, url: str, params: Dict, ttl: float) -> Any:
+        # Retry policy: only failures that are likely transient and cheap to repeat -
+        # connection errors and throttling / gateway statuses - with jittered backoff.
+        # Read timeouts are not retried, they already used their whole budget.
+        for attempt in range(_RETRIES + 1):
+            last = attempt == _RETRIES
+            limiter = self._limiters.get(api)
+            if limiter is not None:
+                await limiter.acquire(max_wait=_RATE_LIMIT_MAX_WAIT)
+            try:
+                response = await get_async_client().get(url, params=params, timeout=_UPSTREAM_TIMEOUT)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if last:
+                    raise
+            else:
+                if response.status_code == 200:
+                    break
+                if last or response.status_code not in _RETRY_STATUSES:
+                    logger.error("%s HTTP %s", api, response.status_code)
+                    raise Exception(f"{api} HTTP {response.status_code}")
+            await asyncio.sleep(_RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+
+        data = orjson.loads(response.content)
+        # Don't pin "no results" answers for the whole TTL
+        if data and not (isinstance(data, dict) and not any(data.values())):
+            with self._response_lock:
+                self._responses[key] = (ttl, data)
+        return data
 
     async def search_recipes_themealdb(self, query: str, max_results: int = 10) -> List[Dict]:
         """TheMealDB search with enhanced error handling"""
-        try:
-            url = f"{self.api_endpoints['themealdb']}/search.php"
-            params = {'s': query}
-            response = requests.get(url, params=params, timeout=10)
-
-            if response.status_code == 200:
-                data = response.json()
-                recipes = []
-                for meal in data.get('meals', [])[:max_results]:
-                    recipe = {
-                        'title': meal.get('strMeal', ''),
-                        'ingredients': [
-                            meal.get(f'strIngredient{i}', '') for i in range(1, 21)
-                            if meal.get(f'strIngredient{i}', '')
-                        ],
-                        'instructions': meal.get('strInstructions', ''),
-                        'category': meal.get('strCategory', ''),
-                        'area': meal.get('strArea', ''),
-                        'image': meal.get('strMealThumb', ''),
-                        'youtube': meal.get('strYoutube', ''),
-                        'source': 'TheMealDB',
-                        'tags': meal.get('strTags', '').split(',') if meal.get('strTags') else [],
-                        'readyInMinutes': 30,  # Default estimate
-                        'servings': 4,  # Default estimate
-                    }
-                    recipes.append(recipe)
-                return recipes
-            else:
-                raise Exception(f"TheMealDB HTTP {response.status_code}")
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"TheMealDB network error: {e}")
-            raise Exception(f"TheMealDB network error: {e}")
-        except Exception as e:
-            logger.error(f"TheMealDB error: {e}")
-            raise
+        url = f"{self.api_endpoints['themealdb']}/search.php"
+        return await self._call_api(
+            'TheMealDB', url, {'s': query}, _TTL_MEALDB,
+            # "meals" is null when nothing matches
+            lambda data: [
+                {**_parse_meal(meal), 'readyInMinutes': 30, 'servings': 4}  # Default estimates
+                for meal in (data.get('meals') or [])[:max_results]
+            ],
+        )
 
     async def search_recipes_spoonacular(self, query: str, max_results: int = 10) -> List[Dict]:
         """Spoonacular search with error handling"""
         if not os.getenv('SPOONACULAR_API_KEY'):
             raise Exception("Spoonacular API key not configured")
 
-        try:
-            url = f"{self.api_endpoints['spoonacular']}/recipes/complexSearch"
-            params = {
-                'apiKey': os.getenv('SPOONACULAR_API_KEY'),
-                'query': query,
-                'number': min(max_results, 3),  # Limit to 3 to stay within free tier
-                'addRecipeInformation': True,
-                'fillIngredients': True,
-            }
-
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                recipes = []
-                for recipe in data.get('results', []):
-                    recipes.append({
-                        'title': recipe.get('title', ''),
-                        'ingredients': [ing['name'] for ing in recipe.get('extendedIngredients', [])],
-                        'instructions': recipe.get('instructions', ''),
-                        'nutrition': recipe.get('nutrition', {}),
-                        'readyInMinutes': recipe.get('readyInMinutes', 0),
-                        'servings': recipe.get('servings', 1),
-                        'image': recipe.get('image', ''),
-                        'source': 'Spoonacular'
-                    })
-                return recipes
-            else:
-                raise Exception(f"Spoonacular HTTP {response.status_code}")
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Spoonacular network error: {e}")
-            raise Exception(f"Spoonacular network error: {e}")
-        except Exception as e:
-            logger.error(f"Spoonacular error: {e}")
-            raise
+        url = f"{self.api_endpoints['spoonacular']}/recipes/complexSearch"
+        params = {
+            'apiKey': os.getenv('SPOONACULAR_API_KEY'),
+            'query': query,
+            'number': min(max_results, 3),  # Limit to 3 to stay within free tier
+            'addRecipeInformation': True,
+            'fillIngredients': True,
+        }
+        return await self._call_api(
+            'Spoonacular', url, params, _TTL_SPOONACULAR,
+            lambda data: [_parse_spoonacular(recipe) for recipe in data.get('results', [])],
+        )
+
+    async def _usda_one(self, url: str, ingredient: str) -> Dict:
+        """Nutrient totals for the top USDA match of one ingredient"""
+        params = {
+            # Normalized so "Chicken breast" from one recipe and "chicken  breast" from
+            # another share a response-cache entry / in-flight call
+            'query': _normalize_ingredient(ingredient),
+            'dataType': ['Foundation', 'SR Legacy'],
+            'pageSize': 1,
+        }
+        return await self._call_api('USDA', url, params, _TTL_USDA, _usda_totals)
 
-    async def get_nutrition_usda(self, ingredients: List[str]) -> Dict:
+    async def get_nutrition_usda(self, ingredients: List[str]) -> NutritionResult:
         """USDA nutrition with enhanced error handling"""
-        try:
-            url = f"{self.api_endpoints['usda']}/foods/search"
-            nutrition_data = {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0}
-
-            for ingredient in ingredients[:3]:  # Limit to 3 ingredients for performance
-                params = {
-                    'query': ingredient,
-                    'dataType': ['Foundation', 'SR Legacy'],
-                    'pageSize': 1,
-                }
+        url = f"{self.api_endpoints['usda']}/foods/search"
+        nutrition_data = dict.fromkeys(_NUTRIENTS, 0)
+        found = False
+        lookups = ingredients[:3]  # Limit to 3 ingredients for performance
+
+        # One request per ingredient, all in flight at once
+        results = await asyncio.gather(
+            *(self._usda_one(url, ingredient) for ingredient in lookups),
+            return_exceptions=True,
+        )
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.warning("USDA lookup failed for one ingredient: %s", result)
+                continue
+            for field, amount in result.items():
+                nutrition_data[field] += amount
+                found = found or bool(amount)
 
-                response = requests.get(url, params=params, timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    for food in data.get('foods', [])[:1]:
-                        for nutrient in food.get('foodNutrients', []):
-                            name = nutrient.get('nutrientName', '')
-                            amount = nutrient.get('value', 0)
-                            unit = nutrient.get('unitName', '')
-
-                            # Handle per 100g values
-                            if 'per 100 g' in name.lower() or unit == 'g':
-                                # Convert to per serving (assuming 100g serving for now)
-                                pass
-                            else:
-                                # Direct values
-                                if 'Energy' in name and 'kcal' in name:
-                                    nutrition_data['calories'] += amount
-                                elif 'Protein' in name:
-                                    nutrition_data['protein'] += amount
-                                elif 'Carbohydrate' in name:
-                                    nutrition_data['carbs'] += amount
-                                elif 'Total lipid' in name or 'Fat' in name:
-                                    nutrition_data['fat'] += amount
-                                elif 'Fiber' in name:
-                                    nutrition_data['fiber'] += amount
-
-            logger.info(f"USDA nutrition data retrieved for {len(ingredients[:3])} ingredients")
-            return nutrition_data
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"USDA network error: {e}")
-            raise Exception(f"USDA network error: {e}")
-        except Exception as e:
-            logger.error(f"USDA error: {e}")
-            raise
+        logger.info("USDA nutrition data retrieved for %d ingredients", len(lookups))
+        return NutritionResult(nutrition_data, empty=not found)
 
-    async def get_nutrition_fatsecret(self, ingredients: List[str]) -> Dict:
+    async def get_nutrition_fatsecret(self, ingredients: List[str]) -> NutritionResult:
         """FatSecret nutrition with error handling"""
         if not self.fatsecret_app_key or not self.fatsecret_app_secret:
             logger.warning("FatSecret credentials not configured")
-            return {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0}
+            return NutritionResult(dict.fromkeys(_NUTRIENTS, 0), empty=True)
 
         try:
             # FatSecret implementation - simplified for demo
             # In production, implement proper OAuth flow
-            nutrition_data = {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0}
+            nutrition_data = dict.fromkeys(_NUTRIENTS, 0)
 
             # For demo purposes, return basic estimates
             # TODO: Implement proper FatSecret OAuth integration
             logger.info("FatSecret nutrition (demo mode - implement proper OAuth)")
 
-            return nutrition_data
+            return NutritionResult(nutrition_data, empty=True)
 
         except Exception as e:
-            logger.error(f"FatSecret error: {e}")
+            logger.error("FatSecret error: %s", e)
             raise
 
     async def get_recipe_by_id_themealdb(self, recipe_id: str) -> Optional[Dict]:
         """Get detailed recipe by ID from TheMealDB"""
+        url = f"{self.api_endpoints['themealdb']}/lookup.php"
         try:
-            url = f"{self.api_endpoints['themealdb']}/lookup.php"
-            params = {'i': recipe_id}
-
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                meal = data.get('meals', [{}])[0]
-
-                return {
-                    'title': meal.get('strMeal', ''),
-                    'ingredients': [
-                        meal.get(f'strIngredient{i}', '') for i in range(1, 21)
-                        if meal.get(f'strIngredient{i}', '')
-                    ],
-                    'instructions': meal.get('strInstructions', ''),
-                    'category': meal.get('strCategory', ''),
-                    'area': meal.get('strArea', ''),
-                    'image': meal.get('strMealThumb', ''),
-                    'youtube': meal.get('strYoutube', ''),
-                    'source': 'TheMealDB',
-                    'tags': meal.get('strTags', '').split(',') if meal.get('strTags') else [],
-                }
+            return await self._call_api(
+                'TheMealDB', url, {'i': recipe_id}, _TTL_MEALDB,
+                lambda data: _parse_meal(data['meals'][0]) if data.get('meals') else None,
+            )
         except Exception as e:
-            logger.warning(f"TheMealDB detail error: {e}")
-
+            logger.warning("TheMealDB detail error: %s", e)
         return None
 
     # Main interface methods
@@ -493,6 +664,7 @@ class RobustRecipeMCPServer:
         # Extract nutrition data if available
         nutrition = recipe_data.get('nutrition', {})
         servings = recipe_data.get('servings', 1)
+        inv_servings = 1.0 / max(servings, 1)  # one division, then multiplies
 
         if nutrition:
             nutrients = nutrition.get('nutrients', [])
@@ -501,13 +673,13 @@ class RobustRecipeMCPServer:
                 amount = nutrient.get('amount', 0)
 
                 if 'Calories' in name:
-                    analysis['calories_per_serving'] = amount / servings
+                    analysis['calories_per_serving'] = amount * inv_servings
                 elif 'Protein' in name:
-                    analysis['protein_per_serving'] = amount / servings
+                    analysis['protein_per_serving'] = amount * inv_servings
                 elif 'Carbohydrates' in name:
-                    analysis['carbs_per_serving'] = amount / servings
+                    analysis['carbs_per_serving'] = amount * inv_servings
                 elif 'Fat' in name:
-                    analysis['fat_per_serving'] = amount / servings
+                    analysis['fat_per_serving'] = amount * inv_servings
 
         # If no nutrition data, estimate based on recipe type and ingredients
         if analysis['calories_per_serving'] == 0:
@@ -515,10 +687,10 @@ class RobustRecipeMCPServer:
             if ingredients:
                 # Get nutrition data for ingredients
                 nutrition_data = await self.get_nutrition_with_fallback(ingredients)
-                analysis['calories_per_serving'] = nutrition_data.get('calories', 0) / max(servings, 1)
-                analysis['protein_per_serving'] = nutrition_data.get('protein', 0) / max(servings, 1)
-                analysis['carbs_per_serving'] = nutrition_data.get('carbs', 0) / max(servings, 1)
-                analysis['fat_per_serving'] = nutrition_data.get('fat', 0) / max(servings, 1)
+                analysis['calories_per_serving'] = nutrition_data.get('calories', 0) * inv_servings
+                analysis['protein_per_serving'] = nutrition_data.get('protein', 0) * inv_servings
+                analysis['carbs_per_serving'] = nutrition_data.get('carbs', 0) * inv_servings
+                analysis['fat_per_serving'] = nutrition_data.get('fat', 0) * inv_servings
             else:
                 # Estimate based on recipe category
                 category = recipe_data.get('category', '').lower()
@@ -542,51 +714,46 @@ class RobustRecipeMCPServer:
         fat = analysis['fat_per_serving']
 
         if calories > 0:
-            # Calculate macro percentages
-            total_calories = calories
-            if total_calories > 0:
-                protein_cal = protein * 4
-                carb_cal = carbs * 4
-                fat_cal = fat * 9
-
-                protein_pct = (protein_cal / total_calories) * 100
-                carb_pct = (carb_cal / total_calories) * 100
-                fat_pct = (fat_cal / total_calories) * 100
-
-                # Score based on balanced macros
-                balance_score = 0
-                if 10 <= protein_pct <= 30:
-                    balance_score += 25
-                if carb_pct <= 65:
-                    balance_score += 25
-                if fat_pct <= 35:
-                    balance_score += 25
-
-                # Score based on calorie appropriateness
-                calorie_score = 0
-                if 200 <= calories <= 600:
-                    calorie_score = 25
-                elif calories < 200:
-                    calorie_score = 15  # Low calorie
-                elif calories > 800:
-                    calorie_score = 10  # High calorie
-                else:
-                    calorie_score = 20
+            # Calculate macro percentages: share of calories from each macro (4/4/9 kcal per g)
+            pct = 100.0 / calories
+            protein_pct = protein * 4 * pct
+            carb_pct = carbs * 4 * pct
+            fat_pct = fat * 9 * pct
+
+            # Score based on balanced macros
+            balance_score = 0
+            if 10 <= protein_pct <= 30:
+                balance_score += 25
+            if carb_pct <= 65:
+                balance_score += 25
+            if fat_pct <= 35:
+                balance_score += 25
+
+            # Score based on calorie appropriateness
+            calorie_score = 0
+            if 200 <= calories <= 600:
+                calorie_score = 25
+            elif calories < 200:
+                calorie_score = 15  # Low calorie
+            elif calories > 800:
+                calorie_score = 10  # High calorie
+            else:
+                calorie_score = 20
 
-                analysis['health_score'] = balance_score + calorie_score
+            analysis['health_score'] = balance_score + calorie_score
 
-                # Generate recommendations
-                if balance_score >= 50:
-                    analysis['recommendations'].append("Well-balanced macronutrients!")
-                else:
-                    analysis['recommendations'].append("Consider balancing protein, carbs, and fat")
+            # Generate recommendations
+            if balance_score >= 50:
+                analysis['recommendations'].append("Well-balanced macronutrients!")
+            else:
+                analysis['recommendations'].append("Consider balancing protein, carbs, and fat")
 
-                if calorie_score >= 20:
-                    analysis['recommendations'].append("Appropriate calorie content")
-                elif calories < 200:
-                    analysis['recommendations'].append("May need more calories for satiety")
-                else:
-                    analysis['recommendations'].append("High calorie meal - watch portions")
+            if calorie_score >= 20:
+                analysis['recommendations'].append("Appropriate calorie content")
+            elif calories < 200:
+                analysis['recommendations'].append("May need more calories for satiety")
+            else:
+                analysis['recommendations'].append("High calorie meal - watch portions")
 
         # Add source information
         analysis['analysis_method'] = 'FREE MCP with USDA + TheMealDB'
@@ -594,5 +761,15 @@ class RobustRecipeMCPServer:
 
         return analysis
 
-# Global MCP server instance
-mcp_server = RobustRecipeMCPServer()
\ No newline at end of file
+
+@functools.lru_cache(maxsize=None)
+def get_mcp_server() -> RobustRecipeMCPServer:
+    """Process-wide MCP server instance, constructed on first use rather than at import"""
+    return RobustRecipeMCPServer()
+
+
+def __getattr__(name: str) -> Any:
+    # Keep `from mcp_server import mcp_server` working, resolved lazily
+    if name == 'mcp_server':
+        return get_mcp_server()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,38 +1,57 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Integer, UniqueConstraint
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Integer, UniqueConstraint, Index, func
 from sqlalchemy.orm import relationship
 from db import Base
 
 def gen_uuid():
     return str(uuid.uuid4())
 
+# DB-side DEFAULT CURRENT_TIMESTAMP covers inserts that omit the column; the Python
+# default stays because SQLite's CURRENT_TIMESTAMP is whole seconds (history order and
+# the profile ETag need finer) and older databases have no server default.
+def _timestamp(**kw):
+    return Column(DateTime, default=datetime.utcnow, server_default=func.now(), **kw)
+
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
     id = Column(String, primary_key=True, default=gen_uuid)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    messages = relationship("Message", back_populates="session", cascade="all, delete-orphan")
+    created_at = _timestamp()
+    # Sessions are mostly fetched just to check they exist, so messages are never loaded
+    # implicitly: query sites that need them use selectinload(ChatSession.messages), and
+    # a lazy load that would emit SQL (the N+1 pattern) raises instead
+    messages = relationship(
+        "Message", back_populates="session", cascade="all, delete-orphan",
+        lazy="raise_on_sql", order_by="Message.created_at",
+    )
 
 class Message(Base):
     __tablename__ = "messages"
     id = Column(String, primary_key=True, default=gen_uuid)
-    session_id = Column(String, ForeignKey("chat_sessions.id"), index=True)
+    session_id = Column(String, ForeignKey("chat_sessions.id"))
     role = Column(String)  # 'user' | 'assistant'
     content = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = _timestamp()
 
-    session = relationship("ChatSession", back_populates="messages")
+    session = relationship("ChatSession", back_populates="messages", lazy="raise_on_sql")
+    # History reads filter by session and order by time: one index serves both
+    __table_args__ = (Index("ix_messages_session_created", "session_id", "created_at"),)
 
 class RecipeCache(Base):
     __tablename__ = "recipe_cache"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    query = Column(String, index=True)
+    query = Column(String)
     title = Column(String)
     url = Column(String)
     summary = Column(Text)
     image = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    __table_args__ = (UniqueConstraint("query", "url", name="uq_query_url"),)
+    created_at = _timestamp()
+    # Lookups are WHERE query = ? ORDER BY created_at DESC: the composite index serves
+    # both, scanned backwards, so no sort step however many rows a query has
+    __table_args__ = (
+        UniqueConstraint("query", "url", name="uq_query_url"),
+        Index("ix_recipe_cache_query_created", "query", "created_at"),
+    )
 
 class UserProfile(Base):
     __tablename__ = "user_profiles"
@@ -40,5 +59,5 @@ class UserProfile(Base):
     diet = Column(String, default="")
     allergens = Column(String, default="")  # comma-separated
     goals = Column(String, default="")      # e.g., heart-healthy, low-sodium
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow)
+    created_at = _timestamp()
+    updated_at = _timestamp(onupdate=datetime.utcnow)
@@ -0,0 +1,110 @@
+"""
+Canonical chat prompt shared by llm.generate_reply* and the LangGraph pipeline.
+Both paths build the same role/content message list here, so a turn renders
+byte-for-byte identically whichever path serves it.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import orjson
+
+# Prior turns sent with each request (the current user turn is added separately)
+HISTORY_TURNS = 10
+SEARCH_RESULTS = 5
+
+
+# Context keys rendered by their own blocks; any other key is passed through as-is
+_PROFILE_KEYS = ("diet", "allergens", "goals")
+_RECIPE_KEY = "selectedRecipe"
+
+
+def _profile_block(profile_ctx: Optional[Dict[str, Any]]) -> str:
+    profile_ctx = profile_ctx or {}
+    diet = profile_ctx.get("diet") or ""
+    allergens = profile_ctx.get("allergens") or ""
+    goals = profile_ctx.get("goals") or ""
+    if not (diet or allergens or goals):
+        return ""
+    return f"User health profile:\nDiet: {diet}\nAllergens: {allergens}\nGoals: {goals}"
+
+
+def _extra_block(profile_ctx: Optional[Dict[str, Any]]) -> str:
+    # Sorted by key so the same context always renders the same text
+    extra = sorted(
+        (k, v) for k, v in (profile_ctx or {}).items()
+        if k not in _PROFILE_KEYS and k != _RECIPE_KEY and v not in (None, "", [], {})
+    )
+    if not extra:
+        return ""
+    return "Additional context:\n" + "\n".join(f"{k}: {_context_value(v)}" for k, v in extra)
+
+
+def _context_value(value: Any) -> str:
+    # Non-string values as sorted-key JSON rather than a Python repr, so nested
+    # dicts render identically regardless of key order
+    if isinstance(value, str):
+        return value
+    return orjson.dumps(value, option=orjson.OPT_SORT_KEYS, default=str).decode()
+
+
+def _recipe_block(selected_recipe: Optional[Dict[str, Any]]) -> str:
+    if not selected_recipe:
+        return ""
+    ingredients = selected_recipe.get("ingredients", "")
+    if isinstance(ingredients, list):
+        ingredients = ", ".join(ingredients)
+    return (
+        "Selected recipe context (from UI):\n"
+        f"Title: {selected_recipe.get('title', '')}\n"
+        f"Ingredients: {ingredients}\n"
+        f"Summary: {selected_recipe.get('summary', '')}"
+    )
+
+
+def _search_block(search_results: Optional[Sequence[Dict[str, Any]]]) -> str:
+    if not search_results:
+        return ""
+    lines = []
+    for r in search_results[:SEARCH_RESULTS]:
+        # recipes.search_recipes_tavily returns sourceUrl/summary; raw Tavily hits use url/content
+        title = r.get("title") or "Result"
+        url = r.get("sourceUrl") or r.get("url") or ""
+        snippet = r.get("summary") or r.get("content") or r.get("snippet") or ""
+        lines.append(f"- {title}: {snippet}\n  {url}")
+    return "Recent findings (web):\n" + "\n".join(lines)
+
+
+def build_messages(
+    system: str,
+    profile_ctx: Optional[Dict[str, Any]],
+    selected_recipe: Optional[Dict[str, Any]],
+    search_results: Optional[Sequence[Dict[str, Any]]],
+    history: Sequence[Dict[str, str]],
+    user_msg: str,
+) -> List[Dict[str, str]]:
+    """
+    Return [{"role": "system"|"user"|"assistant", "content": str}, ...].
+    The system block is ordered stable-first (instructions, profile, other context
+    keys, recipe, search)
+    so it stays a consistent prefix across turns; the current turn is always last.
+    history may already end with the persisted copy of user_msg; it is dropped.
+    """
+    blocks = [
+        system,
+        _profile_block(profile_ctx),
+        _extra_block(profile_ctx),
+        _recipe_block(selected_recipe),
+        _search_block(search_results),
+    ]
+    messages = [{"role": "system", "content": "\n\n".join(b for b in blocks if b).strip()}]
+
+    hist = list(history or [])
+    if hist and hist[-1].get("role") == "user" and (hist[-1].get("content") or "").strip() == user_msg.strip():
+        hist.pop()
+    for m in hist[-HISTORY_TURNS:]:
+        content = (m.get("content") or "").strip()
+        if content:
+            messages.append({"role": "user" if m.get("role") == "user" else "assistant", "content": content})
+
+    messages.append({"role": "user", "content": user_msg})
+    return messages
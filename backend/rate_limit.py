@@ -0,0 +1,42 @@
+"""
+Token-bucket rate limiting for outbound API calls.
+Each bucket refills at `rate` tokens per second up to `burst`. acquire()
+reserves a token and sleeps until it is due, or raises RateLimited when that
+would take longer than the caller is prepared to wait - for quotas like
+150/day the right move is to skip the API, not to queue the request.
+"""
+
+import asyncio
+import math
+import threading
+import time
+
+
+class RateLimited(Exception):
+    """Raised when a call would exceed its API's rate budget"""
+
+
+class AsyncTokenBucket:
+    """Loop-agnostic async token bucket (state guarded by a threading lock, so one
+    bucket can be shared by callers on different event loops)."""
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    async def acquire(self, max_wait: float = math.inf) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Tokens may go negative: each waiter reserves the next one to refill
+            wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            if wait > max_wait:
+                raise RateLimited(f"{self.name} rate limit reached (next slot in {wait:.0f}s)")
+            self._tokens -= 1
+        if wait:
+            await asyncio.sleep(wait)
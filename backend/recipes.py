@@ -1,10 +1,129 @@
 import os
-from typing import List, Dict
-from tavily import TavilyClient
-from db import SessionLocal
+import re
+import asyncio
+import hashlib
+import functools
+import logging
+import random
+import threading
+from datetime import datetime, timedelta
+from itertools import chain, zip_longest
+from typing import List, Dict, Optional
+from cachetools import TTLCache
+from sqlalchemy import bindparam, select
+from async_bridge import run_async
+from db import SessionLocal, insert_ignore
+from http_pool import get_async_client
 from models import RecipeCache
+from singleflight import SingleFlight
+
+logger = logging.getLogger("recipes")
+
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+# Identical searches in flight at the same time (from any request thread) share one call
+_tavily_flights = SingleFlight()
+
+# A dietary context like "low carb, gluten free" is searched as one sub-query per facet
+# (in parallel) rather than one run-on query; at most this many facets, to bound API calls
+_MAX_FACETS = int(os.getenv("RECIPE_SEARCH_MAX_FACETS", "3"))
+
+# Cached results older than this are treated as a miss and replaced on the next search
+CACHE_TTL = timedelta(hours=float(os.getenv("RECIPE_CACHE_TTL_HOURS", "24")))
+
+# Refreshing a key replaces its rows, but keys nobody searches again would stay forever:
+# roughly one cache write in RECIPE_CACHE_EVICT_EVERY also purges everything expired
+_EVICT_EVERY = int(os.getenv("RECIPE_CACHE_EVICT_EVERY", "1000"))
+
+# Hot queries are answered from process memory without touching the database. This is
+# the only in-process layer for web results: /api/recipes/search and the chat graph both
+# come through here, in front of the DB cache
+_mem_cache: TTLCache = TTLCache(maxsize=512, ttl=float(os.getenv("RECIPE_MEM_CACHE_TTL", "300")))
+_mem_cache_lock = threading.Lock()
+
+_WS_RE = re.compile(r"\s+")
+
+# Built once with bound parameters, so every lookup reuses the same statement and its
+# compiled SQL instead of building a fresh query (and its cache key) per call
+_CACHE_LOOKUP = (
+    select(RecipeCache.title, RecipeCache.url, RecipeCache.summary, RecipeCache.image)
+    .where(RecipeCache.query == bindparam("key"), RecipeCache.created_at >= bindparam("cutoff"))
+    .order_by(RecipeCache.created_at.desc())
+    .limit(20)
+)
+
+
+def _read_cache(db, key: str) -> list:
+    """(title, url, summary, image) rows cached for key and still within CACHE_TTL, newest first"""
+    cutoff = datetime.utcnow() - CACHE_TTL
+    return db.execute(_CACHE_LOOKUP, {"key": key, "cutoff": cutoff}).all()
+
+
+def _cache_key(query: str) -> str:
+    """RecipeCache.query value: md5 of the lowercased, sorted query tokens, so case,
+    spacing and word order variants of a search share one cache entry"""
+    return hashlib.md5(" ".join(sorted(_WS_RE.split(query.lower().strip()))).encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, items: List[Dict]) -> None:
+    # Stored and served as copies, so a caller editing its results can't corrupt the cache
+    with _mem_cache_lock:
+        _mem_cache[key] = [dict(item) for item in items]
+
+
+def evict_old_recipe_cache(db) -> int:
+    """Delete RecipeCache rows past CACHE_TTL (never served again); returns the row count"""
+    deleted = (
+        db.query(RecipeCache)
+        .filter(RecipeCache.created_at < datetime.utcnow() - CACHE_TTL)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+@functools.lru_cache(maxsize=1)
+def get_tavily_api_key() -> Optional[str]:
+    """TAVILY_API_KEY, read on first use rather than at import (app.py imports this module
+    before load_dotenv runs) and then kept; tests can cache_clear() to swap it"""
+    return os.getenv("TAVILY_API_KEY")
+
+
+async def tavily_search(query: str, max_results: int = 8, **options) -> List[Dict]:
+    """Tavily hits for query, over the pooled async client (kept-alive connection).
+    The one Tavily call site for the backend; options are extra request fields
+    such as search_depth."""
+    response = await get_async_client().post(TAVILY_SEARCH_URL, json={
+        "api_key": get_tavily_api_key(),
+        "query": query,
+        "max_results": max_results,
+        **options,
+    })
+    response.raise_for_status()
+    return response.json().get("results", [])
+
+
+async def _tavily_search_facets(query: str, facets: List[str], max_results: int = 8) -> List[Dict]:
+    """Search "{query} {facet}" for each facet concurrently and interleave the hits,
+    first occurrence of each url kept; one failed sub-search only loses its share"""
+    subs = [f"{query} {facet}" for facet in facets] or [query]
+    results = await asyncio.gather(
+        *(_tavily_flights.do(_cache_key(sub), functools.partial(tavily_search, sub, max_results)) for sub in subs),
+        return_exceptions=True,
+    )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if len(errors) == len(results):
+        raise errors[0]
+    for e in errors:
+        logger.warning("tavily sub-search failed: %s", e)
+    merged: List[Dict] = []
+    seen = set()
+    for h in chain.from_iterable(zip_longest(*(r for r in results if not isinstance(r, BaseException)))):
+        if h is None or h.get("url") in seen:
+            continue
+        seen.add(h.get("url"))
+        merged.append(h)
+    return merged[:max_results]
 
-tc = TavilyClient(api_key=os.getenv("TAVILY_API_KEY")) if os.getenv("TAVILY_API_KEY") else None
 
 def search_recipes_tavily(query: str, dietary_context: str = "") -> List[Dict]:
     """
@@ -15,58 +134,82 @@ def search_recipes_tavily(query: str, dietary_context: str = "") -> List[Dict]:
         query: The search query
         dietary_context: Optional dietary context to include in the search
     """
-    # Combine query with dietary context if provided
+    facets = [f.strip() for f in dietary_context.split(",") if f.strip()][:_MAX_FACETS]
+    # Combine query with dietary context if provided (this is also the cache key)
+    base_query = query
     if dietary_context:
         query = f"{query} {dietary_context}"
-    if not tc:
+    if not get_tavily_api_key():
         return []
 
-    # Check cache first
-    db = SessionLocal()
-    try:
-        cached = (
-            db.query(RecipeCache)
-            .filter(RecipeCache.query == query)
-            .order_by(RecipeCache.created_at.desc())
-            .limit(20)
-            .all()
-        )
+    key = _cache_key(query)
+    with _mem_cache_lock:
+        hit = _mem_cache.get(key)
+    if hit is not None:
+        return [dict(item) for item in hit]
+
+    with SessionLocal() as db:
+        # Check cache first: plain column tuples, no ORM instances or identity map
+        cached = _read_cache(db, key)
         if cached:
-            return [
-                {"title": r.title, "sourceUrl": r.url, "summary": r.summary, "image": r.image}
-                for r in cached
+            items = [
+                {"title": title, "sourceUrl": url, "summary": summary, "image": image}
+                for title, url, summary, image in cached
             ]
-    finally:
-        db.close()
-
-    # Search Tavily
-    search = tc.search(query=query, max_results=8)
-    hits = search.get("results", [])
-    items: List[Dict] = []
-    for h in hits:
-        items.append({
-            "title": h.get("title"),
-            "sourceUrl": h.get("url"),
-            "summary": h.get("content") or h.get("snippet"),
-            "image": None,
-        })
-
-    # Save to cache
-    db = SessionLocal()
-    try:
-        for it in items:
-            rec = RecipeCache(
-                query=query,
-                title=it.get("title") or "",
-                url=it.get("sourceUrl") or "",
-                summary=it.get("summary") or "",
-                image=it.get("image"),
-            )
+            _remember(key, items)
+            return items
+        # End the read transaction so no pooled connection is held during the web search
+        db.rollback()
+
+        # Search Tavily on the shared event loop; this thread just waits for the result
+        if len(facets) > 1:
+            hits = run_async(_tavily_search_facets(base_query, facets))
+        else:
+            hits = run_async(_tavily_flights.do(key, lambda: tavily_search(query)))
+        # (query, url) is the cache row's key, so hits without a url (or repeating one)
+        # are dropped here; the fresh answer then matches what a cache hit returns later
+        items: List[Dict] = []
+        seen = set()
+        for h in hits:
+            url = h.get("url")
+            if not url or url in seen:
+                continue
+            seen.add(url)
+            items.append({
+                "title": h.get("title") or "",
+                "sourceUrl": url,
+                "summary": h.get("content") or h.get("snippet") or "",
+                "image": None,
+            })
+
+        # Save to cache: expired rows for this key are replaced, in one transaction with a
+        # single multi-row INSERT
+        if not items:
+            return items
+        _remember(key, items)
+        values = [
+            {
+                "query": key,
+                "title": it["title"],
+                "url": it["sourceUrl"],
+                "summary": it["summary"],
+                "image": it["image"],
+            }
+            for it in items
+        ]
+        stmt = insert_ignore(RecipeCache).values(values).on_conflict_do_nothing(index_elements=["query", "url"])
+        try:
+            db.query(RecipeCache).filter(RecipeCache.query == key).delete(synchronize_session=False)
+            db.execute(stmt)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("recipe cache write failed: %s", e)
+            return items
+        if random.random() * _EVICT_EVERY < 1:
             try:
-                db.add(rec)
-                db.commit()
-            except Exception:
+                logger.info("evicted %d expired recipe cache rows", evict_old_recipe_cache(db))
+            except Exception as e:
                 db.rollback()
+                logger.warning("recipe cache eviction failed: %s", e)
         return items
-    finally:
-        db.close()
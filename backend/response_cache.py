@@ -0,0 +1,269 @@
+"""
+Two-tier cache for LLM replies.
+L1: exact match on a SHA256 of (system instructions, user message, context).
+L2: semantic match on the user message embedding within the same
+    (system instructions, context) scope, so paraphrased repeats
+    ("vegan pasta recipe" vs "how to make vegan pasta") are served from memory.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("response_cache")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _digest(*parts: str) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def _context_text(context: Optional[Dict[str, Any]]) -> str:
+    return json.dumps(context or {}, sort_keys=True, default=str)
+
+
+class ResponseCache:
+    """Thread-safe LRU + TTL cache with an optional embedding-similarity tier.
+
+    embed_fn maps a text to a vector; when it is None (or raises), only the
+    exact tier is used.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Optional[Callable[[str], Sequence[float]]] = None,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        similarity: Optional[float] = None,
+    ):
+        self.embed_fn = embed_fn
+        self.maxsize = maxsize
+        self.ttl = ttl if ttl is not None else _env_float("LLM_CACHE_TTL", 24 * 3600)
+        self.similarity = similarity if similarity is not None else _env_float("LLM_CACHE_SIMILARITY", 0.92)
+        self._lock = threading.Lock()
+        # key -> (stored_at, reply)
+        self._exact: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # Semantic rows kept as parallel arrays; vectors are L2-normalized
+        self._vecs: Optional[np.ndarray] = None
+        self._scopes: List[str] = []
+        self._replies: List[str] = []
+        self._stored_at: List[float] = []
+
+    # ---- keys ----
+    @staticmethod
+    def keys_for(system_instructions: str, user_message: str, context: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
+        """Return (exact_key, scope) for a request."""
+        ctx = _context_text(context)
+        return _digest(system_instructions or "", user_message, ctx), _digest(system_instructions or "", ctx)
+
+    # ---- public API ----
+    def get(self, system_instructions: str, user_message: str, context: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        return self._lookup(system_instructions, user_message, context)[0]
+
+    def put(self, system_instructions: str, user_message: str, context: Optional[Dict[str, Any]], reply: str) -> None:
+        self._store(system_instructions, user_message, context, reply, self._embed(user_message))
+
+    def get_or_call(
+        self,
+        system_instructions: str,
+        user_message: str,
+        context: Optional[Dict[str, Any]],
+        compute: Callable[[], str],
+    ) -> str:
+        """Return a cached reply or compute and store one (embedding the query only once)."""
+        hit, q = self._lookup(system_instructions, user_message, context)
+        if hit is not None:
+            return hit
+        reply = compute()
+        self._store(system_instructions, user_message, context, reply, q)
+        return reply
+
+    def clear(self) -> None:
+        with self._lock:
+            self._exact.clear()
+            self._vecs = None
+            self._scopes, self._replies, self._stored_at = [], [], []
+
+    def get_or_stream(
+        self,
+        system_instructions: str,
+        user_message: str,
+        context: Optional[Dict[str, Any]],
+        stream: Callable[[], Iterable[str]],
+    ) -> Iterator[str]:
+        """Streaming variant of get_or_call: a hit is yielded as a single chunk,
+        a miss is passed through and stored once the stream completes."""
+        hit, q = self._lookup(system_instructions, user_message, context)
+        if hit is not None:
+            yield hit
+            return
+        parts: List[str] = []
+        for chunk in stream():
+            parts.append(chunk)
+            yield chunk
+        self._store(system_instructions, user_message, context, "".join(parts).strip(), q)
+
+    # ---- internals ----
+    def _lookup(self, system_instructions: str, user_message: str, context: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        exact_key, scope = self.keys_for(system_instructions, user_message, context)
+        now = time.time()
+        with self._lock:
+            hit = self._exact.get(exact_key)
+            if hit is not None:
+                if now - hit[0] <= self.ttl:
+                    self._exact.move_to_end(exact_key)
+                    logger.info("response cache hit (exact)")
+                    return hit[1], None
+                del self._exact[exact_key]
+
+        # Cold semantic tier: nothing to compare against, so don't delay the miss with an
+        # embed call; _store embeds the query after the reply has been produced
+        with self._lock:
+            self._evict_expired(now)
+            if self._vecs is None or not self._replies:
+                return None, None
+        q = self._embed(user_message)
+        if q is None:
+            return None, None
+        with self._lock:
+            if self._vecs is None or not self._replies:
+                return None, q
+            sims = self._vecs @ q
+            mask = np.fromiter((s == scope for s in self._scopes), dtype=bool, count=len(self._scopes))
+            sims = np.where(mask, sims, -1.0)
+            best = int(np.argmax(sims))
+            if sims[best] >= self.similarity:
+                logger.info("response cache hit (semantic) cos=%.3f", float(sims[best]))
+                return self._replies[best], q
+        return None, q
+
+    def _store(
+        self,
+        system_instructions: str,
+        user_message: str,
+        context: Optional[Dict[str, Any]],
+        reply: str,
+        q: Optional[np.ndarray],
+    ) -> None:
+        if not reply:
+            return
+        if q is None:
+            q = self._embed(user_message)
+        exact_key, scope = self.keys_for(system_instructions, user_message, context)
+        now = time.time()
+        with self._lock:
+            self._exact[exact_key] = (now, reply)
+            self._exact.move_to_end(exact_key)
+            while len(self._exact) > self.maxsize:
+                self._exact.popitem(last=False)
+            if q is None:
+                return
+            self._evict_expired(now)
+            row = q.reshape(1, -1)
+            if self._vecs is None or self._vecs.shape[1] != row.shape[1]:
+                self._vecs = row
+                self._scopes, self._replies, self._stored_at = [scope], [reply], [now]
+            else:
+                self._vecs = np.vstack([self._vecs, row])
+                self._scopes.append(scope)
+                self._replies.append(reply)
+                self._stored_at.append(now)
+            overflow = len(self._replies) - self.maxsize
+            if overflow > 0:
+                self._drop_first(overflow)
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        if self.embed_fn is None or self.similarity >= 1.0:
+            return None
+        try:
+            vec = np.asarray(self.embed_fn(text), dtype=np.float32)
+        except Exception as e:
+            logger.warning("embedding failed, semantic cache skipped: %s", e)
+            return None
+        norm = float(np.linalg.norm(vec))
+        if not norm:
+            return None
+        return vec / norm
+
+    def _evict_expired(self, now: float) -> None:
+        # Rows are appended in time order, so expired ones are always a prefix
+        expired = 0
+        for ts in self._stored_at:
+            if now - ts <= self.ttl:
+                break
+            expired += 1
+        if expired:
+            self._drop_first(expired)
+
+    def _drop_first(self, n: int) -> None:
+        self._scopes = self._scopes[n:]
+        self._replies = self._replies[n:]
+        self._stored_at = self._stored_at[n:]
+        self._vecs = self._vecs[n:] if self._vecs is not None and self._replies else None
+
+
+def is_standalone(history: Sequence[Dict[str, str]]) -> bool:
+    """Follow-up turns depend on the conversation so far; only cache first questions."""
+    return not any(m.get("role") == "assistant" for m in history or [])
+
+
+def cached_call(cache: ResponseCache):
+    """Decorator for generate_reply-shaped functions:
+    fn(system_instructions, history, user_message, extra_context=None) -> str
+    """
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(system_instructions: str, history: list, user_message: str, extra_context: Optional[dict] = None) -> str:
+            if not is_standalone(history):
+                return fn(system_instructions, history, user_message, extra_context)
+            return cache.get_or_call(
+                system_instructions,
+                user_message,
+                extra_context,
+                lambda: fn(system_instructions, history, user_message, extra_context),
+            )
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def cached_stream(cache: ResponseCache):
+    """Like cached_call, for generators yielding reply chunks."""
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(system_instructions: str, history: list, user_message: str, extra_context: Optional[dict] = None) -> Iterator[str]:
+            if not is_standalone(history):
+                return fn(system_instructions, history, user_message, extra_context)
+            return cache.get_or_stream(
+                system_instructions,
+                user_message,
+                extra_context,
+                lambda: fn(system_instructions, history, user_message, extra_context),
+            )
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
@@ -0,0 +1,57 @@
+"""
+In-flight request deduplication ("singleflight").
+Concurrent callers asking for the same key share one execution: the first
+starts the coroutine as its own task and everyone awaits it. Nothing is kept
+once the call settles, so this stacks with (rather than replaces) a result cache.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    """The shared task for one key and the number of callers still awaiting it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Per-event-loop map of key -> task for the call currently in flight."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, _Call]]" = weakref.WeakKeyDictionary()
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run factory() once for concurrent callers with the same key; all of them await its result.
+        A cancelled caller only stops waiting: the shared task is cancelled when no caller is left."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            inflight = self._inflight.setdefault(loop, {})
+            call = inflight.get(key)
+            if call is None:
+                call = inflight[key] = _Call(loop.create_task(factory()))
+                call.task.add_done_callback(lambda _t, c=call: self._forget(inflight, key, c))
+            call.waiters += 1
+        try:
+            # shield: cancelling this caller (owner or not) must not cancel the shared task
+            return await asyncio.shield(call.task)
+        finally:
+            with self._lock:
+                call.waiters -= 1
+                abandoned = not call.waiters and not call.task.done()
+                if abandoned:
+                    self._forget(inflight, key, call)
+            if abandoned:
+                call.task.cancel()
+
+    @staticmethod
+    def _forget(inflight: Dict[Hashable, _Call], key: Hashable, call: _Call) -> None:
+        if inflight.get(key) is call:
+            del inflight[key]
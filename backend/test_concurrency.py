@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Concurrency Primitives Smoke Test
+Checks the in-process concurrency helpers (no API keys or network needed).
+Run: python backend/test_concurrency.py  (or collect with pytest)
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from batching import AsyncBatcher
+from chat_streams import ChatRunRegistry
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from rate_limit import AsyncTokenBucket, RateLimited
+from response_cache import ResponseCache
+from singleflight import SingleFlight
+
+
+def test_singleflight():
+    """Concurrent callers share one execution; its error reaches all of them, and one
+    caller giving up only cancels it when nobody else is waiting"""
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def boom():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError("upstream failed")
+
+    async def main():
+        results = await asyncio.gather(*(flights.do("k", work) for _ in range(5)))
+        assert results == ["done"] * 5 and len(calls) == 1, (results, calls)
+
+        calls.clear()
+        errors = await asyncio.gather(*(flights.do("k", boom) for _ in range(3)), return_exceptions=True)
+        assert len(calls) == 1 and all(isinstance(e, ValueError) for e in errors), errors
+
+        # Nothing is kept once the call settles
+        calls.clear()
+        assert await flights.do("k", work) == "done" and len(calls) == 1
+
+        # Cancelling the first caller doesn't cancel the call its followers share
+        calls.clear()
+        first = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await follower == "done" and len(calls) == 1
+
+        # ...but the call is cancelled once nobody waits for it
+        cancelled = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        waiter = asyncio.ensure_future(flights.do("slow", slow))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        assert cancelled == [1], cancelled
+
+    asyncio.run(main())
+    print("✅ SingleFlight: dedup, error propagation and cancellation")
+
+
+def test_batching():
+    """Calls inside the window go out as one batch; each caller gets its own slot"""
+    batches = []
+
+    async def process(items):
+        batches.append(list(items))
+        return [ValueError(i) if i == "bad" else i.upper() for i in items]
+
+    async def main():
+        batcher = AsyncBatcher(process, max_batch_size=10, max_queue_time=0.02)
+        results = await asyncio.gather(*(batcher.process(i) for i in ("a", "b", "bad")), return_exceptions=True)
+        assert batches == [["a", "b", "bad"]], batches
+        assert results[:2] == ["A", "B"] and isinstance(results[2], ValueError), results
+
+    asyncio.run(main())
+    print("✅ AsyncBatcher: one batch, per-item results")
+
+
+def test_circuit_breaker():
+    """CLOSED -> OPEN after the threshold, HALF_OPEN single probe after the cooldown"""
+    breaker = CircuitBreaker("test", failure_threshold=2, break_duration=0.05)
+    assert breaker.allow_request() and breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request() and breaker.state == HALF_OPEN
+    assert not breaker.allow_request(), "only one probe while half-open"
+    breaker.record_failure()
+    assert breaker.state == OPEN, "failed probe re-opens the circuit"
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0 and breaker.allow_request()
+    print("✅ CircuitBreaker: open / half-open / close transitions")
+
+
+def test_token_bucket():
+    """Burst is spent immediately, then tokens refill at `rate` per second"""
+    bucket = AsyncTokenBucket("test", rate=20.0, burst=2)
+
+    async def main():
+        await bucket.acquire()
+        await bucket.acquire()
+        try:
+            await bucket.acquire(max_wait=0.0)
+            raise AssertionError("empty bucket should refuse a no-wait acquire")
+        except RateLimited:
+            pass
+        t0 = time.monotonic()
+        await bucket.acquire(max_wait=1.0)  # waits ~1/rate for the refill
+        waited = time.monotonic() - t0
+        assert 0.02 <= waited < 0.5, waited
+
+    asyncio.run(main())
+    print("✅ AsyncTokenBucket: burst, refusal and refill")
+
+
+def test_response_cache():
+    """Exact-tier miss, hit, then expiry after the TTL"""
+    cache = ResponseCache(embed_fn=None, ttl=0.05)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "reply"
+
+    assert cache.get("sys", "vegan pasta") is None
+    assert cache.get_or_call("sys", "vegan pasta", None, compute) == "reply" and len(calls) == 1
+    assert cache.get_or_call("sys", "vegan pasta", None, compute) == "reply" and len(calls) == 1
+    assert cache.get("sys", "vegan pasta", {"diet": "keto"}) is None, "context is part of the key"
+    time.sleep(0.06)
+    assert cache.get("sys", "vegan pasta") is None, "expired entries are not served"
+    print("✅ ResponseCache: miss / hit / expiry")
+
+
+def test_chat_run_replay():
+    """A subscriber joining after the run finished replays every chunk; a reconnect resumes by index"""
+    registry = ChatRunRegistry(max_workers=2, retention=5.0)
+    release = threading.Event()
+
+    def produce(run):
+        run.publish("Hello")
+        release.wait(1.0)
+        run.publish(" world")
+
+    run, started = registry.get_or_start("session:req-1", produce)
+    again, started_again = registry.get_or_start("session:req-1", produce)
+    assert started and not started_again and again is run, "same key attaches to the running reply"
+    release.set()
+
+    first = [e for e in run.subscribe(heartbeat=0.05) if e is not None]
+    late = [e for e in run.subscribe(heartbeat=0.05) if e is not None]
+    assert first == late == [(0, "Hello"), (1, " world")], (first, late)
+    resumed = [e for e in run.subscribe(start=1, heartbeat=0.05) if e is not None]
+    assert resumed == [(1, " world")], "a reconnect resumes after its last event id"
+
+    other, started_other = registry.get_or_start("session:req-2", produce)
+    assert started_other and other is not run, "a new request id starts a new run"
+    print("✅ ChatRun: replay to a late subscriber")
+
+
+def test_chat_run_cancel():
+    """A run stops once cancelled, or once no subscriber is left for the grace period"""
+    registry = ChatRunRegistry(max_workers=2, retention=5.0, grace=0.05)
+    produced = {}
+
+    def produce(run):
+        n = 0
+        while n < 100 and not run.cancelled:
+            run.publish(str(n))
+            n += 1
+            time.sleep(0.01)
+        produced[run.key] = n
+
+    run, _ = registry.get_or_start("session:left", produce)
+    events = run.subscribe(heartbeat=0.05)
+    next(events)
+    events.close()  # the client disconnected
+    time.sleep(0.3)
+    assert produced.get("session:left", 100) < 100, "abandoned run stops after the grace period"
+
+    run, _ = registry.get_or_start("session:stop", produce)
+    events = run.subscribe(heartbeat=0.05)
+    next(events)
+    assert registry.cancel("session:stop")
+    list(events)
+    assert produced["session:stop"] < 100 and not registry.cancel("session:stop")
+    print("✅ ChatRun: cancel and abandoned-run stop")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing concurrency primitives...")
+    print("=" * 50)
+    test_singleflight()
+    test_batching()
+    test_circuit_breaker()
+    test_token_bucket()
+    test_response_cache()
+    test_chat_run_replay()
+    test_chat_run_cancel()
+    print("=" * 50)
+    print("✅ All concurrency checks passed")
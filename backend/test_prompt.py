@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Prompt Builder Smoke Test
+Checks prompt.build_messages, shared by the direct and LangGraph chat paths
+(no API keys or network needed).
+Run: python backend/test_prompt.py  (or collect with pytest)
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from prompt import HISTORY_TURNS, build_messages
+
+
+def test_known_context_keys():
+    """Profile, selected recipe and search hits render in order; the turn is last and not repeated"""
+    ctx = {"diet": "vegan", "allergens": "nuts", "goals": "", "selectedRecipe": {"title": "Dal"}}
+    history = [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+        {"role": "user", "content": "soup ideas?"},  # persisted copy of the current turn
+    ]
+    hits = [{"title": "Lentil soup", "url": "https://example.com/soup", "content": "Easy soup"}]
+    messages = build_messages("Be helpful.", ctx, ctx["selectedRecipe"], hits, history, "soup ideas?")
+
+    system = messages[0]["content"]
+    assert messages[0]["role"] == "system" and system.startswith("Be helpful.")
+    assert "Diet: vegan\nAllergens: nuts\nGoals: " in system
+    assert system.index("User health profile") < system.index("Title: Dal") < system.index("Lentil soup")
+    assert "Additional context" not in system, "only known keys were sent"
+    assert [m["role"] for m in messages[1:]] == ["user", "assistant", "user"], messages
+    assert messages[-1] == {"role": "user", "content": "soup ideas?"}
+
+    # Same inputs, same bytes: both chat paths share this prefix
+    assert build_messages("Be helpful.", ctx, ctx["selectedRecipe"], hits, history, "soup ideas?") == messages
+
+    long_history = [{"role": "user", "content": f"q{i}"} for i in range(HISTORY_TURNS + 5)]
+    assert len(build_messages("s", None, None, None, long_history, "now")) == HISTORY_TURNS + 2
+    print("✅ build_messages: known context keys, history and turn order")
+
+
+def test_extra_context_keys():
+    """Context keys without their own block are passed through, sorted by key"""
+    ctx = {"diet": "keto", "servings": 4, "cuisine": "thai", "notes": "", "selectedRecipe": None}
+    system = build_messages("s", ctx, None, None, [], "dinner?")[0]["content"]
+    assert system.endswith("Additional context:\ncuisine: thai\nservings: 4"), system
+    assert "notes" not in system and "selectedRecipe" not in system
+
+    # Nested values render as sorted-key JSON, whatever order the keys came in
+    a = build_messages("s", {"pantry": {"rice": 1, "beans": True}}, None, None, [], "x")[0]["content"]
+    b = build_messages("s", {"pantry": {"beans": True, "rice": 1}}, None, None, [], "x")[0]["content"]
+    assert a == b and a.endswith('pantry: {"beans":true,"rice":1}'), a
+    print("✅ build_messages: extra context keys passed through")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing prompt builder...")
+    print("=" * 50)
+    test_known_context_keys()
+    test_extra_context_keys()
+    print("=" * 50)
+    print("✅ All prompt checks passed")
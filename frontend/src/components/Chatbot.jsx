@@ -67,6 +67,9 @@ export default function Chatbot({ sessionId, selectedRecipe, healthProfile }) {
     const optimistic = [...messages, { role: 'user', content: text }]
     setMessages(optimistic)
     setSending(true)
+    // unique per message: browser reconnects reuse the URL and resume this reply,
+    // and the fallback POST sends it so the server can't generate the turn twice
+    const requestId = crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random()}`
 
     try {
       const context = {
@@ -79,9 +82,11 @@ export default function Chatbot({ sessionId, selectedRecipe, healthProfile }) {
         message: text,
         use_graph: 'true',
         context: JSON.stringify(context),
+        request_id: requestId,
       })
 
       let closed = false
+      let received = false
       await new Promise((resolve, reject) => {
         try {
           const es = new EventSource(`${BASE}/api/chat/stream?${params.toString()}`)
@@ -99,12 +104,15 @@ export default function Chatbot({ sessionId, selectedRecipe, healthProfile }) {
               closed = true
               streamingRef.current = false
               setStreaming(false)
+              // Closing the EventSource alone leaves the server generating; tell it to stop
+              api.post('/api/chat/stream/cancel', { session_id: sessionId, request_id: requestId }).catch(() => {})
               resolve()
             }
           }
 
           es.addEventListener('message', (ev) => {
             const chunk = ev.data || ''
+            received = true
             if (chunk.startsWith('ERROR:')) {
               setError(chunk.replace(/^ERROR:\s*/, ''))
               es.close()
@@ -134,14 +142,22 @@ export default function Chatbot({ sessionId, selectedRecipe, healthProfile }) {
             resolve()
           })
 
-          es.onerror = (e) => {
-            // Fallback to non-streaming if SSE fails early
-            if (!closed) {
-              es.close()
-              streamingRef.current = false
-              setStreaming(false)
-              currentEsRef.current = null
-              finishStreamRef.current = null
+          es.onerror = () => {
+            if (closed) return
+            // CONNECTING: the browser retries by itself and resumes after the last event id
+            if (es.readyState === EventSource.CONNECTING) return
+            es.close()
+            closed = true
+            streamingRef.current = false
+            setStreaming(false)
+            currentEsRef.current = null
+            finishStreamRef.current = null
+            if (received) {
+              // Part of the reply is on screen; re-requesting it would duplicate the turn
+              setError('Connection lost before the reply finished.')
+              resolve()
+            } else {
+              // Fallback to non-streaming if SSE fails before any output
               reject(new Error('SSE failed'))
             }
           }
@@ -161,6 +177,7 @@ export default function Chatbot({ sessionId, selectedRecipe, healthProfile }) {
           message: text,
           context,
           use_graph: true,
+          request_id: requestId,
         })
         setMessages([...optimistic, { role: 'assistant', content: res.data.reply }])
       } catch {
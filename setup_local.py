@@ -7,15 +7,38 @@ Run this to set up and test your local environment
 import os
 import sys
 import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Backend and frontend are set up concurrently: log lines go through one lock, and
+# installer output is captured and only shown when a step fails
+_print_lock = threading.Lock()
+
+def _log(msg):
+    with _print_lock:
+        print(msg, flush=True)
+
+def _run(cmd, cwd, check=False):
+    result = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        _log(f"{' '.join(cmd)} failed:\n{result.stdout}{result.stderr}")
+        if check:
+            raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
+    return result
 
 def check_requirements():
     """Check if all requirements are met"""
     print("🔍 Checking requirements...")
 
+    # Probe both tools at once; results are reported in order below
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        fut_py = ex.submit(subprocess.run, [sys.executable, "--version"], capture_output=True, text=True)
+        fut_node = ex.submit(subprocess.run, ["node", "--version"], capture_output=True, text=True)
+
     # Check Python
     try:
-        result = subprocess.run([sys.executable, "--version"], capture_output=True, text=True)
+        result = fut_py.result()
         print(f"✅ Python: {result.stdout.strip()}")
     except:
         print("❌ Python not found")
@@ -23,7 +46,7 @@ def check_requirements():
 
     # Check Node.js
     try:
-        result = subprocess.run(["node", "--version"], capture_output=True, text=True)
+        result = fut_node.result()
         print(f"✅ Node.js: {result.stdout.strip()}")
     except:
         print("❌ Node.js not found")
@@ -33,14 +56,14 @@ def check_requirements():
 
 def setup_backend():
     """Setup backend environment"""
-    print("\n📦 Setting up backend...")
+    _log("\n📦 Setting up backend...")
 
     backend_dir = os.path.join(os.getcwd(), "backend")
 
     # Create .env if missing
     env_file = os.path.join(backend_dir, ".env")
     if not os.path.exists(env_file):
-        print("Creating backend/.env...")
+        _log("Creating backend/.env...")
         with open(env_file, "w") as f:
             f.write("""FLASK_ENV=development
 PORT=4000
@@ -53,33 +76,33 @@ TAVILY_API_KEY=your_tavily_key_here
 # Database (SQLite for local development)
 DATABASE_URL=sqlite:///./app.db
 """)
-        print("⚠️  Please edit backend/.env and add your API keys!")
+        _log("⚠️  Please edit backend/.env and add your API keys!")
 
     # Create virtual environment if needed
     venv_path = os.path.join(backend_dir, ".venv")
     if not os.path.exists(venv_path):
-        print("Creating virtual environment...")
-        subprocess.run([sys.executable, "-m", "venv", ".venv"], cwd=backend_dir)
+        _log("Creating virtual environment...")
+        _run([sys.executable, "-m", "venv", ".venv"], cwd=backend_dir)
 
     # Install dependencies
-    print("Installing Python dependencies...")
-    subprocess.run([os.path.join(venv_path, "Scripts", "python"), "-m", "pip", "install", "-r", "requirements.txt"],
-                   cwd=backend_dir, check=True)
+    _log("Installing Python dependencies...")
+    _run([os.path.join(venv_path, "Scripts", "python"), "-m", "pip", "install", "-r", "requirements.txt"],
+         cwd=backend_dir, check=True)
 
-    print("✅ Backend setup complete")
+    _log("✅ Backend setup complete")
 
 def setup_frontend():
     """Setup frontend environment"""
-    print("\n📦 Setting up frontend...")
+    _log("\n📦 Setting up frontend...")
 
     frontend_dir = os.path.join(os.getcwd(), "frontend")
 
     # Install dependencies
     if not os.path.exists(os.path.join(frontend_dir, "node_modules")):
-        print("Installing Node.js dependencies...")
-        subprocess.run(["npm", "install"], cwd=frontend_dir, check=True)
+        _log("Installing Node.js dependencies...")
+        _run(["npm", "install"], cwd=frontend_dir, check=True)
 
-    print("✅ Frontend setup complete")
+    _log("✅ Frontend setup complete")
 
 def test_backend():
     """Test backend connectivity"""
@@ -102,8 +125,10 @@ def main():
         print("\n❌ Requirements not met. Please install Python 3.8+ and Node.js 16+")
         sys.exit(1)
 
-    setup_backend()
-    setup_frontend()
+    # Independent directories and toolchains: run pip and npm side by side
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        for fut in [ex.submit(setup_backend), ex.submit(setup_frontend)]:
+            fut.result()
 
     print("\n" + "=" * 50)
     print("✅ Setup complete!")
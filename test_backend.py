@@ -1,17 +1,23 @@
 import os
 import sys
 import requests
+from requests.adapters import HTTPAdapter
 
 # Test backend connectivity
 BACKEND_URL = os.getenv('VITE_API_BASE_URL', 'http://localhost:4000')
 
 def test_backend():
+    # One keep-alive session: health -> session -> chat reuse the same connection
+    http = requests.Session()
+    http.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
     print(f"🔍 Testing backend at: {BACKEND_URL}")
     print("=" * 50)
 
     try:
         # Test health endpoint
-        response = requests.get(f"{BACKEND_URL}/health", timeout=10)
+        response = http.get(f"{BACKEND_URL}/health", timeout=10)
         print(f"✅ Health check: {response.status_code}")
         print(f"   Response: {response.json()}")
     except requests.exceptions.ConnectionError:
@@ -24,14 +30,14 @@ def test_backend():
 
     try:
         # Test chat session creation
-        response = requests.post(f"{BACKEND_URL}/api/sessions", timeout=10)
+        response = http.post(f"{BACKEND_URL}/api/sessions", timeout=10)
         if response.status_code == 200:
             session_id = response.json().get('session_id')
             print(f"✅ Session creation: {response.status_code}")
             print(f"   Session ID: {session_id}")
 
             # Test chat message
-            chat_response = requests.post(f"{BACKEND_URL}/api/chat", json={
+            chat_response = http.post(f"{BACKEND_URL}/api/chat", json={
                 "session_id": session_id,
                 "message": "test message",
                 "use_graph": False
@@ -1,5 +1,7 @@
 import os
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 import json
 
 def test_local_setup():
@@ -8,10 +10,19 @@ def test_local_setup():
     print("🧪 Testing Local MyRecipeFinder Setup")
     print("=" * 40)
 
+    # One keep-alive session for the backend sequence; the frontend check doesn't depend
+    # on the backend, so it runs in the background meanwhile (plain requests.get there:
+    # a Session must not be shared between threads)
+    http = requests.Session()
+    http.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    pool = ThreadPoolExecutor(max_workers=1)
+    frontend = pool.submit(requests.get, "http://localhost:5173", timeout=5)
+    pool.shutdown(wait=False)
+
     # Test backend
     print("1. Testing Backend (http://localhost:4000)")
     try:
-        response = requests.get("http://localhost:4000/health", timeout=5)
+        response = http.get("http://localhost:4000/health", timeout=5)
         print(f"   ✅ Health: {response.status_code}")
     except:
         print("   ❌ Backend not running - start with: python app.py")
@@ -19,7 +30,7 @@ def test_local_setup():
 
     # Test session creation
     try:
-        response = requests.post("http://localhost:4000/api/sessions", timeout=5)
+        response = http.post("http://localhost:4000/api/sessions", timeout=5)
         if response.status_code == 200:
             session_id = response.json()["session_id"]
             print(f"   ✅ Session: {response.status_code} (ID: {session_id[:8]}...)")
@@ -32,9 +43,9 @@ def test_local_setup():
 
     # Test chat (without API keys)
     try:
-        response = requests.post("http://localhost:4000/api/chat",
-                                json={"session_id": session_id, "message": "test", "use_graph": False},
-                                timeout=10)
+        response = http.post("http://localhost:4000/api/chat",
+                             json={"session_id": session_id, "message": "test", "use_graph": False},
+                             timeout=10)
         if response.status_code == 400:
             print("   ✅ Chat: Expected error (no API keys) - this is normal")
         elif response.status_code == 200:
@@ -47,7 +58,7 @@ def test_local_setup():
     # Test frontend
     print("\n2. Testing Frontend (http://localhost:5173)")
     try:
-        response = requests.get("http://localhost:5173", timeout=5)
+        response = frontend.result()
         print(f"   ✅ Frontend: {response.status_code}")
     except:
         print("   ❌ Frontend not running - start with: npm run dev")